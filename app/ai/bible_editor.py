@@ -1,71 +1,76 @@
 from __future__ import annotations
 
+import io
 import re
 from typing import Any
 
+import anyio
+from sqlalchemy import func
 from sqlmodel import Session, select
 
-from app.ai.client import get_openai_client
+from app.ai.client import (
+    aadd_message_to_thread,
+    acreate_thread,
+    add_message_to_thread,
+    adelete_thread,
+    arun_assistant,
+    create_thread,
+    delete_thread,
+    get_async_openai_client,
+    get_openai_client,
+    run_assistant,
+)
+from app.crud.oracle import get_or_create_bible_editor_assistant
 from app.models.bible import BibleSection
 
 
+# A header is a whole "I." .. "IV." line, or one of the bare keywords at line start
+_HEADER_RE = re.compile(
+    r"^(?P<roman>I|II|III|IV)\..*|^(?P<word>Problems|Ideas|Characters|World)",
+    re.MULTILINE,
+)
+
+# Map headers to friendlier display names. Roman headers are keyed by their
+# numeral plus ". " (so "I.x" keeps its own name); keywords by the word itself.
+_DISPLAY_NAMES = {
+    "I. ": "I. The World",
+    "II. ": "II. Metaphysical System",
+    "III. ": "III. Characters",
+    "IV. ": "IV. Story Beats",
+    "Problems": "Issues/Problems",
+    "Ideas": "Ideas",
+    "Characters": "Character Profiles",
+    "World": "World Building"
+}
+
+
 def parse_document_into_sections(content: str) -> dict[str, dict[str, Any]]:
     """
     Parse document content into sections based on headers.
     Adapted from the original bible editor logic.
     """
-    # Define regex patterns for headers
-    patterns = [
-        r"(I\.\s.*?)(?=\n[IV]+\.|Problems|Ideas|Characters|$)",
-        r"(II\.\s.*?)(?=\n[IV]+\.|Problems|Ideas|Characters|$)",
-        r"(III\.\s.*?)(?=\n[IV]+\.|Problems|Ideas|Characters|$)",
-        r"(IV\.\s.*?)(?=\n[IV]+\.|Problems|Ideas|Characters|$)",
-        r"(Problems)(?=\n[IV]+\.|Ideas|Characters|$)",
-        r"(Ideas)(?=\n[IV]+\.|Problems|Characters|$)",
-        r"(Characters)(?=\n[IV]+\.|Problems|Ideas|World|$)",
-        r"(World)(?=\n[IV]+\.|Problems|Ideas|Characters|$)"
-    ]
-
     sections = {}
-    remaining_text = content
-
-    # Map headers to friendlier display names
-    markers = {
-        "I. ": "I. The World",
-        "II. ": "II. Metaphysical System",
-        "III. ": "III. Characters",
-        "IV. ": "IV. Story Beats",
-        "Problems": "Issues/Problems",
-        "Ideas": "Ideas",
-        "Characters": "Character Profiles",
-        "World": "World Building"
-    }
 
-    # Split the document by headers
-    split_pattern = r"(^I\..*|^II\..*|^III\..*|^IV\..*|^Problems|^Ideas|^Characters|^World)"
-    parts = re.split(split_pattern, content, flags=re.MULTILINE)
+    # Single pass over the headers; each body runs to the next header
+    headers = list(_HEADER_RE.finditer(content))
 
     current_header = "Intro/Uncategorized"
-    if parts:
-        sections[current_header] = {
-            "section_name": current_header,
-            "display_name": current_header,
-            "content": parts[0].strip(),
-            "order": 0
-        }
+    sections[current_header] = {
+        "section_name": current_header,
+        "display_name": current_header,
+        "content": content[: headers[0].start() if headers else len(content)].strip(),
+        "order": 0
+    }
 
-    order = 1
-    for i in range(1, len(parts), 2):
-        header = parts[i].strip()
-        content_text = parts[i+1].strip() if i+1 < len(parts) else ""
+    for order, m in enumerate(headers, start=1):
+        header = m.group(0).strip()
+        end = headers[order].start() if order < len(headers) else len(content)
+        content_text = content[m.end():end].strip()
 
         # Clean up header name
-        display_name = header
         section_name = header
-        for key, val in markers.items():
-            if header.startswith(key) or header == key:
-                display_name = val
-                break
+        key = m.group("word") or header[: len(m.group("roman")) + 2]
+        display_name = _DISPLAY_NAMES.get(key, header)
 
         sections[display_name] = {
             "section_name": section_name,
@@ -73,64 +78,78 @@ def parse_document_into_sections(content: str) -> dict[str, dict[str, Any]]:
             "content": content_text,
             "order": order
         }
-        order += 1
 
     return sections
 
 
-def get_full_bible_context(session: Session) -> str:
-    """
-    Get the full bible content for context when editing sections.
-    """
-    sections = session.exec(
-        select(BibleSection).order_by(BibleSection.order)
-    ).all()
+_SYSTEM_PREAMBLE = """
+You are an expert novel editor and writing assistant.
 
-    if not sections:
-        return ""
+BELOW IS THE ENTIRE CONTEXT OF THE NOVEL PROJECT.
+READ IT TO UNDERSTAND THE WORLD, TONE, AND PLOT.
 
-    full_content = []
-    for section in sections:
-        full_content.append(f"{section.section_name}\n{section.content}")
+YOUR TASK:
+The user will provide a specific SECTION to edit and INSTRUCTIONS.
+You must:
+1. Analyze how the changes fit the global context (tone, established facts).
+2. Rewrite the section based on the instructions.
+3. Output ONLY the rewritten section.
+""".strip()
 
-    return "\n\n".join(full_content)
+# Joined bible context per database URL: url -> (version_token, text)
+_CTX_CACHE: dict[str, tuple[str, str]] = {}
 
 
-def edit_bible_section(
-    session: Session,
-    section_name: str,
-    current_content: str,
-    user_instructions: str
-) -> str:
+def bible_version_token(session: Session) -> str:
+    """Cheap fingerprint of the bible table (latest edit + row count)."""
+    latest, count = session.exec(
+        select(func.max(BibleSection.updated_at), func.count(BibleSection.id))
+    ).one()
+    return f"{latest}|{count}"
+
+
+def get_full_bible_context(session: Session) -> str:
     """
-    Edit a specific bible section using OpenAI with full context.
-    Adapted from the original bible editor logic.
+    Get the full bible content for context when editing sections.
+    The joined text is cached until a section is added, removed or updated.
     """
+    cache_key = str(session.get_bind().url)
+    token = bible_version_token(session)
+    cached = _CTX_CACHE.get(cache_key)
+    if cached and cached[0] == token:
+        return cached[1]
+
+    rows = session.exec(
+        select(BibleSection.section_name, BibleSection.content).order_by(BibleSection.order)
+    )
 
-    # Get full bible context
-    full_context = get_full_bible_context(session)
+    buf = io.StringIO()
+    for i, (section_name, content) in enumerate(rows):
+        if i:
+            buf.write("\n\n")
+        buf.write(section_name)
+        buf.write("\n")
+        buf.write(content)
+    full_context = buf.getvalue()
+    _CTX_CACHE[cache_key] = (token, full_context)
+    return full_context
 
-    client = get_openai_client()
 
-    system_prompt = f"""
-    You are an expert novel editor and writing assistant.
+# Assistant instructions are capped at 256k characters; a bible too large to
+# fit there goes out as a plain chat completion system prompt instead
+_MAX_INSTRUCTIONS_CHARS = 256_000
+_EDITOR_MODEL = "gpt-4o"
+_EDITOR_TEMPERATURE = 0.7
 
-    BELOW IS THE ENTIRE CONTEXT OF THE NOVEL PROJECT.
-    READ IT TO UNDERSTAND THE WORLD, TONE, AND PLOT.
 
-    --- START CONTEXT ---
-    {full_context}
-    --- END CONTEXT ---
+def _editor_instructions(session: Session) -> str:
+    # Instructions = preamble + bible; the assistant is only updated when this text changes
+    full_context = get_full_bible_context(session)
+    return f"{_SYSTEM_PREAMBLE}\n\n--- START CONTEXT ---\n{full_context}\n--- END CONTEXT ---"
 
-    YOUR TASK:
-    The user will provide a specific SECTION to edit and INSTRUCTIONS.
-    You must:
-    1. Analyze how the changes fit the global context (tone, established facts).
-    2. Rewrite the section based on the instructions.
-    3. Output ONLY the rewritten section.
-    """
 
-    user_message = f"""
+def _edit_request(section_name: str, current_content: str, user_instructions: str) -> str:
+    return f"""
     --- CURRENT SECTION: {section_name} ---
     {current_content}
     ----------------------------
@@ -139,13 +158,76 @@ def edit_bible_section(
     {user_instructions}
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
+
+def _completion_kwargs(instructions: str, request: str) -> dict[str, Any]:
+    return {
+        "model": _EDITOR_MODEL,
+        "messages": [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": request},
         ],
-        temperature=0.7
+        "temperature": _EDITOR_TEMPERATURE,
+    }
+
+
+def edit_bible_section(
+    session: Session,
+    section_name: str,
+    current_content: str,
+    user_instructions: str
+) -> str:
+    """
+    Edit a specific bible section using OpenAI with full context.
+    The bible lives in a cached assistant's instructions, so each edit only
+    sends the section and the user's instructions.
+    """
+    client = get_openai_client()
+    instructions = _editor_instructions(session)
+    request = _edit_request(section_name, current_content, user_instructions)
+    if len(instructions) > _MAX_INSTRUCTIONS_CHARS:
+        response = client.chat.completions.create(**_completion_kwargs(instructions, request))
+        return response.choices[0].message.content
+
+    assistant = get_or_create_bible_editor_assistant(session, instructions, _EDITOR_MODEL)
+
+    # Each edit is a one-off exchange, so its thread is deleted once answered
+    thread_id = create_thread(client)
+    try:
+        add_message_to_thread(client, thread_id, request)
+        return run_assistant(client, thread_id, assistant.assistant_id)
+    finally:
+        try:
+            delete_thread(client, thread_id)
+        except Exception:
+            pass
+
+
+async def aedit_bible_section(
+    session: Session,
+    section_name: str,
+    current_content: str,
+    user_instructions: str
+) -> str:
+    """Async variant of edit_bible_section."""
+    client = get_async_openai_client()
+    # Reading the bible and refreshing the assistant (needed after every accepted
+    # edit, through the sync client) block, so both run on a worker thread
+    instructions = await anyio.to_thread.run_sync(_editor_instructions, session)
+    request = _edit_request(section_name, current_content, user_instructions)
+    if len(instructions) > _MAX_INSTRUCTIONS_CHARS:
+        response = await client.chat.completions.create(**_completion_kwargs(instructions, request))
+        return response.choices[0].message.content
+
+    assistant = await anyio.to_thread.run_sync(
+        get_or_create_bible_editor_assistant, session, instructions, _EDITOR_MODEL
     )
 
-    return response.choices[0].message.content
+    thread_id = await acreate_thread(client)
+    try:
+        await aadd_message_to_thread(client, thread_id, request)
+        return await arun_assistant(client, thread_id, assistant.assistant_id)
+    finally:
+        try:
+            await adelete_thread(client, thread_id)
+        except Exception:
+            pass
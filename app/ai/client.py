@@ -1,15 +1,70 @@
 from __future__ import annotations
 
-from openai import OpenAI
+import asyncio
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 
 from app.core.config import get_settings
 
 
-def get_openai_client() -> OpenAI:
+# Run polling: start at 250ms, back off to at most 2s between retrieves.
+# requires_action is terminal here since the oracle registers no tools.
+_POLL_INITIAL_DELAY = 0.25
+_POLL_MAX_DELAY = 2.0
+_RUN_TERMINAL_STATUSES = frozenset({"completed", "failed", "cancelled", "expired", "incomplete", "requires_action"})
+
+
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# One client per process so request threads share its HTTP/2 connection pool
+_CLIENT: OpenAI | None = None
+_ASYNC_CLIENT: AsyncOpenAI | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _require_api_key() -> str:
     settings = get_settings()
     if not settings.openai_api_key:
         raise RuntimeError("OPENAI_API_KEY is not set. Create a .env file and set OPENAI_API_KEY.")
-    return OpenAI(api_key=settings.openai_api_key)
+    return settings.openai_api_key
+
+
+def get_openai_client() -> OpenAI:
+    global _CLIENT
+    if _CLIENT is not None:
+        return _CLIENT
+
+    api_key = _require_api_key()
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = OpenAI(
+                api_key=api_key,
+                http_client=DefaultHttpxClient(http2=True, timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS),
+            )
+    return _CLIENT
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Shared async client for the `a*` engine variants.
+    Its connection pool belongs to the event loop that first uses it (the server loop).
+    """
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is not None:
+        return _ASYNC_CLIENT
+
+    api_key = _require_api_key()
+    with _CLIENT_LOCK:
+        if _ASYNC_CLIENT is None:
+            _ASYNC_CLIENT = AsyncOpenAI(
+                api_key=api_key,
+                http_client=DefaultAsyncHttpxClient(http2=True, timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS),
+            )
+    return _ASYNC_CLIENT
 
 
 def create_oracle_assistant(client: OpenAI, instructions: str, model: str = "gpt-4o-mini") -> str:
@@ -24,6 +79,18 @@ def create_oracle_assistant(client: OpenAI, instructions: str, model: str = "gpt
     return assistant.id
 
 
+def create_bible_editor_assistant(client: OpenAI, instructions: str, model: str = "gpt-4o") -> str:
+    """Create an assistant whose instructions carry the full bible context."""
+    assistant = client.beta.assistants.create(
+        name="LoreKeeper Bible Editor",
+        description="Rewrites bible sections using the cached novel bible as context",
+        instructions=instructions,
+        model=model,
+        temperature=0.7,
+    )
+    return assistant.id
+
+
 def update_oracle_assistant(client: OpenAI, assistant_id: str, instructions: str) -> None:
     """Update an existing assistant's instructions."""
     client.beta.assistants.update(
@@ -37,12 +104,23 @@ def delete_oracle_assistant(client: OpenAI, assistant_id: str) -> None:
     client.beta.assistants.delete(assistant_id)
 
 
+def embed_text(client: OpenAI, text: str, model: str = "text-embedding-3-small") -> list[float]:
+    """Embed a single string (OpenAI embeddings are unit length)."""
+    resp = client.embeddings.create(model=model, input=text)
+    return resp.data[0].embedding
+
+
 def create_thread(client: OpenAI) -> str:
     """Create a new conversation thread."""
     thread = client.beta.threads.create()
     return thread.id
 
 
+def delete_thread(client: OpenAI, thread_id: str) -> None:
+    """Delete a thread."""
+    client.beta.threads.delete(thread_id)
+
+
 def add_message_to_thread(client: OpenAI, thread_id: str, content: str, role: str = "user") -> str:
     """Add a message to a thread."""
     message = client.beta.threads.messages.create(
@@ -60,12 +138,16 @@ def run_assistant(client: OpenAI, thread_id: str, assistant_id: str) -> str:
         assistant_id=assistant_id,
     )
 
-    # Wait for completion
-    while run.status != "completed":
-        if run.status == "failed":
-            raise RuntimeError(f"Assistant run failed: {run.last_error}")
+    # Wait for completion, backing off between polls
+    delay = _POLL_INITIAL_DELAY
+    while run.status not in _RUN_TERMINAL_STATUSES:
+        time.sleep(delay)
+        delay = min(delay * 1.5, _POLL_MAX_DELAY)
         run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
 
+    if run.status != "completed":
+        raise RuntimeError(f"Assistant run {run.status}: {run.last_error}")
+
     # Get the latest message from the assistant
     messages = client.beta.threads.messages.list(thread_id=thread_id, limit=1)
     if messages.data:
@@ -73,3 +155,50 @@ def run_assistant(client: OpenAI, thread_id: str, assistant_id: str) -> str:
     return ""
 
 
+async def aembed_text(client: AsyncOpenAI, text: str, model: str = "text-embedding-3-small") -> list[float]:
+    """Async variant of embed_text."""
+    resp = await client.embeddings.create(model=model, input=text)
+    return resp.data[0].embedding
+
+
+async def acreate_thread(client: AsyncOpenAI) -> str:
+    """Async variant of create_thread."""
+    thread = await client.beta.threads.create()
+    return thread.id
+
+
+async def adelete_thread(client: AsyncOpenAI, thread_id: str) -> None:
+    """Async variant of delete_thread."""
+    await client.beta.threads.delete(thread_id)
+
+
+async def aadd_message_to_thread(client: AsyncOpenAI, thread_id: str, content: str, role: str = "user") -> str:
+    """Async variant of add_message_to_thread."""
+    message = await client.beta.threads.messages.create(
+        thread_id=thread_id,
+        role=role,
+        content=content,
+    )
+    return message.id
+
+
+async def arun_assistant(client: AsyncOpenAI, thread_id: str, assistant_id: str) -> str:
+    """Async variant of run_assistant; polling yields to the event loop."""
+    run = await client.beta.threads.runs.create(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+    )
+
+    delay = _POLL_INITIAL_DELAY
+    while run.status not in _RUN_TERMINAL_STATUSES:
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, _POLL_MAX_DELAY)
+        run = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+
+    if run.status != "completed":
+        raise RuntimeError(f"Assistant run {run.status}: {run.last_error}")
+
+    messages = await client.beta.threads.messages.list(thread_id=thread_id, limit=1)
+    if messages.data:
+        return messages.data[0].content[0].text.value
+    return ""
@@ -4,9 +4,12 @@ import json
 import re
 from typing import Any
 
-from sqlmodel import Session, select
+import anyio
+from sqlalchemy import literal, union_all
+from sqlmodel import Session, func, select
 
-from app.ai.client import get_openai_client
+from app.ai.client import get_async_openai_client, get_openai_client
+from app.ai.keywords import KeywordMatcher
 from app.models.codex import Character, Concept
 from app.models.problems import PlotHole
 from app.models.timeline import Event
@@ -39,28 +42,93 @@ ACT_BEATS: dict[str, list[str]] = {
     ],
 }
 
-
-def _strip_json_fences(s: str) -> str:
-    s = (s or "").strip()
-    if s.startswith("```"):
-        # Handle ```json ... ``` or ``` ... ```
-        s = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", s)
-        s = re.sub(r"\s*```$", "", s)
-    return s.strip()
+_WS_RE = re.compile(r"\s+")
+_FIRST_WORD_RE = re.compile(r"[a-z]+")
+
+_QUESTION_STARTS = frozenset(
+    {"what", "who", "when", "where", "why", "how", "can", "could", "should", "does", "do", "did", "is", "are", "will", "would"}
+)
+
+# _heuristic_extract
+_NAME_IS_RE = re.compile(
+    r"\b(?:his|her|their)?\s*name\s+is\s+([A-Za-z][\w-]{0,50}(?:\s+[A-Za-z][\w-]{0,50}){0,2})\b",
+    re.IGNORECASE,
+)
+_NAMED_RE = re.compile(r"\bnamed\s+([A-Za-z][\w-]{0,50}(?:\s+[A-Za-z][\w-]{0,50}){0,2})\b", re.IGNORECASE)
+_POWER_RE = re.compile(r"\bpower\s+of\s+([^,.;\n]{3,80})")
+_ABILITY_RE = re.compile(r"\bability\s+to\s+([^,.;\n]{3,80})")
+_ACT_RE = re.compile(r"\bact\s*([123])\b")
+_ACT_BY_DIGIT = {"1": "ACT 1", "2": "ACT 2", "3": "ACT 3"}
+
+# _extract_explicit_plot_hole_command
+_TITLE_CMD_RE = re.compile(r"\b(?:saying|titled|title)\s*:\s*(.+)$", re.IGNORECASE)
+_KIND_CMD_RE = re.compile(r"\b(?:problem|issue|plot\s*hole|plothole)\b\s*:\s*(.+)$", re.IGNORECASE)
+
+# Keyword groups; every substring test in this module goes through one
+# _KEYWORDS scan per text.
+# Beat keywords, checked in order; the first hit decides the beat
+_BEAT_BY_KEYWORD = {
+    "intro": "Exposition/Introduction",
+    "introduction": "Exposition/Introduction",
+    "exposition": "Exposition/Introduction",
+    "inciting": "Inciting Incident",
+}
+_HEURISTIC_KEYWORDS = frozenset({"power of", "ability to", "inciting", "scene", "new scene", "learn"})
+_PROBLEM_COMMAND_KEYWORDS = frozenset(
+    {
+        "create a problem",
+        "create an issue",
+        "create issue",
+        "create problem",
+        "plot hole",
+        "plothole",
+        "new problem",
+        "new issue",
+    }
+)
+_SCENE_KIND_KEYWORDS = frozenset({"scene", "rewrite", "fix scene"})
+_CONCEPT_KIND_KEYWORDS = frozenset({"concept", "rule", "lore", "system"})
+_KIND_KEYWORDS = frozenset({"continuity", "pacing", "motivation", "worldbuilding"})
+_CREATION_KEYWORDS = frozenset(
+    {
+        "create a",
+        "create an",
+        "add a",
+        "add an",
+        "new character",
+        "new concept",
+        "new event",
+        "new plot hole",
+        "new issue",
+        "new problem",
+    }
+)
+_KEYWORDS = KeywordMatcher(
+    frozenset(_BEAT_BY_KEYWORD)
+    | _HEURISTIC_KEYWORDS
+    | _PROBLEM_COMMAND_KEYWORDS
+    | _SCENE_KIND_KEYWORDS
+    | _CONCEPT_KIND_KEYWORDS
+    | _KIND_KEYWORDS
+    | _CREATION_KEYWORDS
+)
+
+
+def _is_question(text: str) -> bool:
+    """A '?' anywhere, or a first word like who/what/can/does (so "what's" counts, "whole" doesn't)."""
+    if "?" in text:
+        return True
+    m = _FIRST_WORD_RE.match(text.lstrip().lower())
+    return bool(m) and m.group(0) in _QUESTION_STARTS
 
 
 def _titleish(s: str) -> str:
-    s = re.sub(r"\s+", " ", (s or "").strip())
+    s = _WS_RE.sub(" ", (s or "").strip())
     if not s:
         return ""
-    # Keep acronyms; otherwise title-case words
-    words = []
-    for w in s.split(" "):
-        if w.isupper() and len(w) <= 6:
-            words.append(w)
-        else:
-            words.append(w[:1].upper() + w[1:])
-    return " ".join(words)
+    # Upper-case each word's first letter only. Acronyms already start upper-case,
+    # and str.title() would lower-case inner capitals ("McAllister" -> "Mcallister").
+    return " ".join([w[:1].upper() + w[1:] for w in s.split(" ")])
 
 
 def _heuristic_extract(text: str) -> dict[str, Any]:
@@ -73,7 +141,7 @@ def _heuristic_extract(text: str) -> dict[str, Any]:
     plot_holes: list[dict[str, str]] = []
 
     # Don't extract from questions
-    if "?" in t or any(lower.startswith(word) for word in ["what", "who", "when", "where", "why", "how", "can ", "could ", "should ", "does ", "do ", "did ", "is ", "are ", "will ", "would "]):
+    if _is_question(t):
         return {
             "characters": characters,
             "concepts": concepts,
@@ -83,49 +151,35 @@ def _heuristic_extract(text: str) -> dict[str, Any]:
         }
 
     # Character: "His name is Zion" / "named Zion" - be more specific
-    m = re.search(
-        r"\b(?:his|her|their)?\s*name\s+is\s+([A-Za-z][\w-]{0,50}(?:\s+[A-Za-z][\w-]{0,50}){0,2})\b",
-        t,
-        flags=re.IGNORECASE,
-    ) or re.search(
-        r"\bnamed\s+([A-Za-z][\w-]{0,50}(?:\s+[A-Za-z][\w-]{0,50}){0,2})\b",
-        t,
-        flags=re.IGNORECASE,
-    )
+    m = _NAME_IS_RE.search(t) or _NAMED_RE.search(t)
     char_name = _titleish(m.group(1)) if m else ""
     if char_name:
         characters.append({"name": char_name, "traits": "", "arc": ""})
 
     # Concept: "power of flying" / "ability to fly" - require more context
     concept_title = ""
-    if "power of" in lower or "ability to" in lower:
-        m = re.search(r"\bpower\s+of\s+([^,.;\n]{3,80})", lower)
+    hits = _KEYWORDS.hits(lower)
+
+    if "power of" in hits or "ability to" in hits:
+        m = _POWER_RE.search(lower)
         if m:
             concept_title = _titleish(m.group(1))
         else:
-            m2 = re.search(r"\bability\s+to\s+([^,.;\n]{3,80})", lower)
+            m2 = _ABILITY_RE.search(lower)
             if m2:
                 concept_title = _titleish(m2.group(1))
     if concept_title:
         concepts.append({"title": concept_title, "description": ""})
 
     # Act / beat signals - only if clearly describing story structure
-    act = None
-    if re.search(r"\bact\s*1\b", lower):
-        act = "ACT 1"
-    elif re.search(r"\bact\s*2\b", lower):
-        act = "ACT 2"
-    elif re.search(r"\bact\s*3\b", lower):
-        act = "ACT 3"
-
-    beat = None
-    if any(k in lower for k in ["intro", "introduction", "exposition"]):
-        beat = "Exposition/Introduction"
-    elif "inciting" in lower:
-        beat = "Inciting Incident"
+    # The lowest act mentioned wins
+    act_digit = min(_ACT_RE.findall(lower), default=None)
+    act = _ACT_BY_DIGIT[act_digit] if act_digit else None
+
+    beat = next((b for k, b in _BEAT_BY_KEYWORD.items() if k in hits), None)
 
     # Event: look for "scene" + at least a character/concept/act hint, but be more conservative
-    if ("scene" in lower or act or beat) and (char_name or concept_title or "new scene" in lower):
+    if ("scene" in hits or act or beat) and (char_name or concept_title or "new scene" in hits):
         parts = []
         if act:
             parts.append(act)
@@ -133,7 +187,7 @@ def _heuristic_extract(text: str) -> dict[str, Any]:
             parts.append(beat)
 
         core = ""
-        if char_name and concept_title and ("learn" in lower or "learned" in lower):
+        if char_name and concept_title and "learn" in hits:
             core = f"{char_name} learns {concept_title}"
         elif char_name and concept_title:
             core = f"{char_name} + {concept_title}"
@@ -172,47 +226,33 @@ def _extract_explicit_plot_hole_command(text: str) -> dict[str, Any] | None:
     if not t:
         return None
 
-    lower = t.lower()
-    if not any(
-        k in lower
-        for k in [
-            "create a problem",
-            "create an issue",
-            "create issue",
-            "create problem",
-            "plot hole",
-            "plothole",
-            "new problem",
-            "new issue",
-        ]
-    ):
+    hits = _KEYWORDS.hits(t.lower())
+    if hits.isdisjoint(_PROBLEM_COMMAND_KEYWORDS):
         return None
 
     # Infer kind from keywords
     kind = "plot_hole"
-    if any(k in lower for k in ["scene", "rewrite", "fix scene"]):
+    if not hits.isdisjoint(_SCENE_KIND_KEYWORDS):
         kind = "scene_to_fix"
-    if any(k in lower for k in ["concept", "rule", "lore", "system"]):
+    if not hits.isdisjoint(_CONCEPT_KIND_KEYWORDS):
         kind = "concept_issue"
-    if "continuity" in lower:
+    if "continuity" in hits:
         kind = "continuity"
-    if "pacing" in lower:
+    if "pacing" in hits:
         kind = "pacing"
-    if "motivation" in lower:
+    if "motivation" in hits:
         kind = "character_motivation"
-    if "worldbuilding" in lower:
+    if "worldbuilding" in hits:
         kind = "worldbuilding"
 
     # Try to capture a "title" after common delimiters
-    m = re.search(r"\b(?:saying|titled|title)\s*:\s*(.+)$", t, flags=re.IGNORECASE) or re.search(
-        r"\b(?:problem|issue|plot\s*hole|plothole)\b\s*:\s*(.+)$", t, flags=re.IGNORECASE
-    )
+    m = _TITLE_CMD_RE.search(t) or _KIND_CMD_RE.search(t)
     title = (m.group(1).strip() if m else "").strip()
-    title = re.sub(r"\s+", " ", title)
+    title = _WS_RE.sub(" ", title)
 
     if not title:
         # Fallback: use whole message (trimmed) as title, but keep it short
-        title = re.sub(r"\s+", " ", t)
+        title = _WS_RE.sub(" ", t)
         title = title[:120].rstrip()
 
     return {
@@ -224,62 +264,106 @@ def _extract_explicit_plot_hole_command(text: str) -> dict[str, Any] | None:
     }
 
 
-def extract_entities_from_text(
-    session: Session,
-    *,
-    text: str,
-    model: str = "gpt-4o-mini",
-) -> dict[str, Any]:
-    """
-    Returns a dict like:
-      {
-        "characters": [{"name": str, "traits": str, "arc": str}],
-        "concepts": [{"title": str, "description": str}],
-        "events": [{"title": str, "description": str, "act": str|null, "beat": str|null, "approx_order": int}],
-        "plot_holes": [{"title": str, "description": str, "kind": str}],
-        "source": "llm"|"heuristic"
-      }
-    """
-    cleaned = (text or "").strip()
+# Inputs shorter than this are trusted to the heuristic when it finds entities
+_HEURISTIC_MAX_CHARS = 200
+
+
+def _extract_without_llm(cleaned: str) -> dict[str, Any] | None:
+    """Result for messages that never reach the LLM (empty, questions, explicit commands, short heuristic hits)."""
     if not cleaned:
         return {"characters": [], "concepts": [], "events": [], "plot_holes": [], "source": "heuristic"}
 
     # Don't extract from questions unless they contain explicit creation commands
     lower = cleaned.lower()
-    is_question = ("?" in cleaned or
-                  any(lower.startswith(word) for word in ["what", "who", "when", "where", "why", "how", "can ", "could ", "should ", "does ", "do ", "did ", "is ", "are ", "will ", "would "]))
-    has_creation_command = any(keyword in lower for keyword in ["create a", "create an", "add a", "add an", "new character", "new concept", "new event", "new plot hole", "new issue", "new problem"])
+    is_question = _is_question(cleaned)
+    has_creation_command = not _KEYWORDS.hits(lower).isdisjoint(_CREATION_KEYWORDS)
 
     if is_question and not has_creation_command:
         return {"characters": [], "concepts": [], "events": [], "plot_holes": [], "source": "heuristic"}
 
     forced = _extract_explicit_plot_hole_command(cleaned)
-    if forced:
+    if forced is not None:
         return forced
 
+    # Short, simple inputs ("his name is Zion") are handled well by the heuristic;
+    # skip the LLM round-trip when it already found something.
+    if len(cleaned) < _HEURISTIC_MAX_CHARS:
+        heur = _heuristic_extract(cleaned)
+        if heur["characters"] or heur["concepts"] or heur["events"]:
+            return heur
+
+    return None
+
+
+# (model, name column, existing_index key) for the dedup index sent to the LLM
+_INDEX_SOURCES = (
+    (Character, Character.name, "characters"),
+    (Concept, Concept.title, "concepts"),
+    (Event, Event.title, "events"),
+    (PlotHole, PlotHole.title, "plot_holes"),
+)
+_INDEX_LIMIT = 200
+
+# Engine URL -> (fingerprint, existing_index names)
+_EXISTING_CACHE: dict[str, tuple[tuple[Any, ...], dict[str, list[str]]]] = {}
+
+
+def _existing_index_token(session: Session) -> tuple[Any, ...]:
+    """
+    One-row fingerprint (max id, count, latest edit) of every indexed table.
+    Each aggregate is answered from an index: max(id) from the rowid b-tree's
+    last entry, count(*) by SQLite's b-tree count, max(updated_at) from the
+    end of ix_<table>_updated_at.
+    """
+    cols = []
+    for model, _, _ in _INDEX_SOURCES:
+        cols += [
+            select(func.max(model.id)).scalar_subquery(),
+            select(func.count()).select_from(model).scalar_subquery(),
+            select(func.max(model.updated_at)).scalar_subquery(),
+        ]
+    return tuple(session.exec(select(*cols)).one())
+
+
+def _existing_index(session: Session) -> dict[str, list[str]]:
+    """Sorted names per kind (first 200 each), re-read only after a write."""
+    cache_key = str(session.get_bind().url)
+    token = _existing_index_token(session)
+    cached = _EXISTING_CACHE.get(cache_key)
+    if cached and cached[0] == token:
+        return cached[1]
+
+    parts = [
+        select(select(literal(key).label("kind"), col.label("name")).order_by(col).limit(_INDEX_LIMIT).subquery())
+        for _, col, key in _INDEX_SOURCES
+    ]
+    index: dict[str, list[str]] = {key: [] for _, _, key in _INDEX_SOURCES}
+    for kind, name in session.exec(union_all(*parts)):
+        index[kind].append(name)
+    # Subquery order isn't guaranteed to survive the union
+    for names in index.values():
+        names.sort()
+
+    _EXISTING_CACHE[cache_key] = (token, index)
+    return index
+
+
+def _extraction_messages(session: Session, cleaned: str) -> list[dict[str, str]]:
     # Small "index" to reduce duplicates
-    existing = {
-        "characters": session.exec(select(Character.name).order_by(Character.name).limit(200)).all(),
-        "concepts": session.exec(select(Concept.title).order_by(Concept.title).limit(200)).all(),
-        "events": session.exec(select(Event.title).order_by(Event.title).limit(200)).all(),
-        "plot_holes": session.exec(select(PlotHole.title).order_by(PlotHole.title).limit(200)).all(),
+    existing: dict[str, Any] = {
+        **_existing_index(session),
         "acts_note": "Acts are stored on Events via event.act; do not create separate Act records.",
     }
 
-    try:
-        client = get_openai_client()
-    except Exception:
-        return _heuristic_extract(cleaned)
-
     system = (
         "You extract NEW lore entities from text for a fiction database. "
         "Return STRICT JSON ONLY. No markdown, no commentary."
     )
 
+    # Prompt-cache prefix: everything before "existing_index" is identical on
+    # every call; keep per-call data (existing_index, text) at the end.
     user: dict[str, Any] = {
         "task": "Extract entities to create/update from this text.",
-        "text": cleaned,
-        "existing_index": existing,
         "allowed_acts": list(ACT_BEATS.keys()),
         "allowed_beats_by_act": ACT_BEATS,
         "output_schema": {
@@ -300,29 +384,92 @@ def extract_entities_from_text(
             "If not sure about act/beat, set them to null.",
             "Return only the JSON object with keys: characters, concepts, events, plot_holes.",
         ],
+        "existing_index": existing,
+        "text": cleaned,
     }
 
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": json.dumps(user, separators=(",", ":"))},
+    ]
+
+
+def _parse_extraction(content: str) -> dict[str, Any]:
+    parsed = json.loads(content)
+    # Normalize missing keys
+    return {
+        "characters": parsed.get("characters") or [],
+        "concepts": parsed.get("concepts") or [],
+        "events": parsed.get("events") or [],
+        "plot_holes": parsed.get("plot_holes") or [],
+        "source": "llm",
+    }
+
+
+def extract_entities_from_text(
+    session: Session,
+    *,
+    text: str,
+    model: str = "gpt-4o-mini",
+) -> dict[str, Any]:
+    """
+    Returns a dict like:
+      {
+        "characters": [{"name": str, "traits": str, "arc": str}],
+        "concepts": [{"title": str, "description": str}],
+        "events": [{"title": str, "description": str, "act": str|null, "beat": str|null, "approx_order": int}],
+        "plot_holes": [{"title": str, "description": str, "kind": str}],
+        "source": "llm"|"heuristic"
+      }
+    """
+    cleaned = (text or "").strip()
+    early = _extract_without_llm(cleaned)
+    if early is not None:
+        return early
+
+    try:
+        client = get_openai_client()
+    except Exception:
+        return _heuristic_extract(cleaned)
+
     try:
         resp = client.chat.completions.create(
             model=model,
             temperature=0.2,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": json.dumps(user)},
-            ],
+            response_format={"type": "json_object"},
+            messages=_extraction_messages(session, cleaned),
         )
-        content = _strip_json_fences(resp.choices[0].message.content or "")
-        parsed = json.loads(content)
-        # Normalize missing keys
-        out = {
-            "characters": parsed.get("characters") or [],
-            "concepts": parsed.get("concepts") or [],
-            "events": parsed.get("events") or [],
-            "plot_holes": parsed.get("plot_holes") or [],
-            "source": "llm",
-        }
-        return out
+        return _parse_extraction(resp.choices[0].message.content or "")
     except Exception:
         return _heuristic_extract(cleaned)
 
 
+async def aextract_entities_from_text(
+    session: Session,
+    *,
+    text: str,
+    model: str = "gpt-4o-mini",
+) -> dict[str, Any]:
+    """Async variant of extract_entities_from_text, for running alongside other LLM calls."""
+    cleaned = (text or "").strip()
+    early = _extract_without_llm(cleaned)
+    if early is not None:
+        return early
+
+    try:
+        client = get_async_openai_client()
+    except Exception:
+        return _heuristic_extract(cleaned)
+
+    try:
+        # Reads the session (sync SQLite), so it runs on a worker thread, not the event loop
+        messages = await anyio.to_thread.run_sync(_extraction_messages, session, cleaned)
+        resp = await client.chat.completions.create(
+            model=model,
+            temperature=0.2,
+            response_format={"type": "json_object"},
+            messages=messages,
+        )
+        return _parse_extraction(resp.choices[0].message.content or "")
+    except Exception:
+        return _heuristic_extract(cleaned)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation with shared prefixes factored out ("add (?:a(?:n)?|event)").
+    At each text position the engine follows one branch per character, as an
+    Aho-Corasick goto step would, and greedy optional tails yield the longest
+    keyword starting there.
+    """
+    trie: dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end-of-keyword marker
+
+    def build(node: dict[str, dict]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds which of a fixed set of substrings occur in a text with one scan.
+
+    Equivalent to `{k for k in keywords if k in text}`, but the text is walked
+    once by a single compiled prefix-trie pattern instead of once per keyword.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        # Each position reports its longest keyword; the shorter keywords
+        # contained in it are implied (see _implied).
+        unique = set(keywords)
+        self._re = re.compile("(?=(" + _trie_pattern(unique) + "))")
+        self._implied = {k: frozenset(o for o in unique if o in k) for k in unique}
+
+    def hits(self, text: str) -> frozenset[str]:
+        found: set[str] = set()
+        for m in self._re.finditer(text):
+            found |= self._implied[m.group(1)]
+        return frozenset(found)
+
+    def any(self, text: str) -> bool:
+        """True if at least one keyword occurs in `text` (stops at the first hit)."""
+        return self._re.search(text) is not None
@@ -1,115 +1,212 @@
 from __future__ import annotations
 
 import json
+from functools import partial
 from typing import Any
 
+import anyio
+from sqlalchemy import func, literal, null, union_all
 from sqlmodel import Session, select
 
-from app.ai.client import add_message_to_thread, get_openai_client, run_assistant
-from app.crud.oracle import get_or_create_oracle_assistant, get_or_create_oracle_thread
+from app.ai.client import (
+    aadd_message_to_thread,
+    add_message_to_thread,
+    aembed_text,
+    arun_assistant,
+    embed_text,
+    get_async_openai_client,
+    get_openai_client,
+    run_assistant,
+)
+from app.crud.oracle import (
+    find_cached_answer,
+    get_instructions_hash,
+    get_or_create_oracle_assistant,
+    get_or_create_oracle_thread,
+    has_oracle_thread,
+    lore_version_token,
+    store_cached_answer,
+)
+from app.crud.search import fts_query, fts_rowids
 from app.crud.settings import get_oracle_instructions
 from app.models.codex import Act, Character, Concept
 from app.models.problems import PlotHole
 from app.models.timeline import Event
 
 
+# Shared column layout for the RAG-lite UNION ALL; entities that lack a
+# column select NULL in its place.
+_RAG_COLUMNS = ("title", "body", "notes", "status", "importance", "incomplete", "sort_order")
+
+
+def _rag_part(kind: str, columns: dict[str, Any], *, where: Any, order_by: tuple[Any, ...], limit: int):
+    ranked = select(
+        literal(kind).label("kind"),
+        func.row_number().over(order_by=order_by).label("pos"),
+        *[columns.get(name, null()).label(name) for name in _RAG_COLUMNS],
+    )
+    if where is not None:
+        ranked = ranked.where(where)
+    # SQLite rejects LIMIT on bare compound members, so wrap each in a subquery
+    return select(ranked.order_by(*order_by).limit(limit).subquery())
+
+
+def _rag_query(match: str | None, limits: dict[str, int]):
+    """One statement returning every entity bucket; ``match=None`` means no filter."""
+
+    def hits(model: Any) -> Any:
+        return model.id.in_(fts_rowids(model.__tablename__, match)) if match is not None else None
+
+    parts = [
+        _rag_part(
+            "characters",
+            {
+                "title": Character.name,
+                "body": Character.traits,
+                "notes": Character.arc,
+                "status": Character.status,
+                "importance": Character.importance,
+                "incomplete": Character.is_incomplete,
+            },
+            where=hits(Character),
+            order_by=(Character.importance.desc(), Character.name),
+            limit=limits["characters"],
+        ),
+        _rag_part(
+            "concepts",
+            {"title": Concept.title, "body": Concept.description, "status": Concept.status, "importance": Concept.importance},
+            where=hits(Concept),
+            order_by=(Concept.importance.desc(), Concept.title),
+            limit=limits["concepts"],
+        ),
+        _rag_part(
+            "acts",
+            {
+                "title": Act.title,
+                "body": Act.summary,
+                "status": Act.status,
+                "importance": Act.importance,
+                "incomplete": Act.is_incomplete,
+            },
+            where=hits(Act),
+            order_by=(Act.importance.desc(), Act.title),
+            limit=limits["acts"],
+        ),
+        _rag_part(
+            "events",
+            {
+                "title": Event.title,
+                "body": Event.description,
+                "notes": Event.ai_notes,
+                "sort_order": Event.effective_order,
+            },
+            where=hits(Event),
+            order_by=(Event.ai_suggested_order, Event.approx_order),
+            limit=limits["events"],
+        ),
+        _rag_part(
+            "plot_holes",
+            {
+                "title": PlotHole.title,
+                "body": PlotHole.description,
+                "notes": PlotHole.ai_suggestions,
+                "status": PlotHole.status,
+                "importance": PlotHole.importance,
+            },
+            where=hits(PlotHole),
+            order_by=(PlotHole.importance.desc(), PlotHole.created_at.desc()),
+            limit=limits["plot_holes"],
+        ),
+    ]
+    return union_all(*parts).order_by("kind", "pos")
+
+
+def fetch_rag_rows(session: Session, match: str | None, limits: dict[str, int]) -> dict[str, list[Any]]:
+    """
+    Runs the RAG-lite UNION ALL and buckets its rows by kind ("characters",
+    "concepts", "acts", "events", "plot_holes"). Every kind needs a limit; 0
+    skips it. Rows expose the _RAG_COLUMNS names.
+    """
+    buckets: dict[str, list[Any]] = {kind: [] for kind in limits}
+    for row in session.execute(_rag_query(match, limits)):
+        buckets[row.kind].append(row)
+    return buckets
+
+
 def build_rag_lite_context(session: Session, *, question: str, limit: int = 8) -> dict[str, Any]:
-    like = f"%{question.strip()}%"
+    match = fts_query(question)
 
     oracle_instructions = get_oracle_instructions(session)
 
-    characters = session.exec(
-        select(Character)
-        .where(Character.name.like(like) | Character.traits.like(like) | Character.arc.like(like))
-        .order_by(Character.importance.desc(), Character.name)
-        .limit(limit)
-    ).all()
-    concepts = session.exec(
-        select(Concept)
-        .where(Concept.title.like(like) | Concept.description.like(like))
-        .order_by(Concept.importance.desc(), Concept.title)
-        .limit(limit)
-    ).all()
-    acts = session.exec(
-        select(Act)
-        .where(Act.title.like(like) | Act.summary.like(like))
-        .order_by(Act.importance.desc(), Act.title)
-        .limit(limit)
-    ).all()
-    events = session.exec(
-        select(Event)
-        .where(Event.title.like(like) | Event.description.like(like) | Event.ai_notes.like(like))
-        .order_by(Event.ai_suggested_order, Event.approx_order)
-        .limit(limit)
-    ).all()
-    holes = session.exec(
-        select(PlotHole)
-        .where(PlotHole.title.like(like) | PlotHole.description.like(like) | PlotHole.ai_suggestions.like(like))
-        .order_by(PlotHole.importance.desc(), PlotHole.created_at.desc())
-        .limit(limit)
-    ).all()
-
-    # Fallback: if LIKE finds nothing (common), still provide top-level “index” context
-    if not (characters or concepts or acts or events or holes):
-        characters = session.exec(select(Character).order_by(Character.importance.desc(), Character.name).limit(12)).all()
-        concepts = session.exec(select(Concept).order_by(Concept.importance.desc(), Concept.title).limit(12)).all()
-        acts = session.exec(select(Act).order_by(Act.importance.desc(), Act.title).limit(12)).all()
-        events = session.exec(select(Event).order_by(Event.ai_suggested_order, Event.approx_order).limit(18)).all()
-        holes = session.exec(select(PlotHole).order_by(PlotHole.importance.desc(), PlotHole.created_at.desc()).limit(12)).all()
+    rows: dict[str, list[Any]] = {}
+    if match is not None:
+        rows = fetch_rag_rows(session, match, dict.fromkeys(("characters", "concepts", "acts", "events", "plot_holes"), limit))
+
+    # Fallback: if full-text search finds nothing, still provide top-level “index” context
+    if not any(rows.values()):
+        rows = fetch_rag_rows(
+            session,
+            None,
+            {"characters": 12, "concepts": 12, "acts": 12, "events": 18, "plot_holes": 12},
+        )
 
     return {
         "oracle_instructions": oracle_instructions,
         "characters": [
             {
-                "name": c.name,
-                "traits": c.traits,
-                "arc": c.arc,
+                "name": c.title,
+                "traits": c.body,
+                "arc": c.notes,
                 "status": c.status,
                 "importance": c.importance,
-                "incomplete": c.is_incomplete,
+                "incomplete": bool(c.incomplete),
             }
-            for c in characters
+            for c in rows["characters"]
         ],
         "concepts": [
-            {"title": c.title, "description": c.description, "status": c.status, "importance": c.importance}
-            for c in concepts
+            {"title": c.title, "description": c.body, "status": c.status, "importance": c.importance}
+            for c in rows["concepts"]
         ],
         "acts": [
-            {"title": a.title, "summary": a.summary, "status": a.status, "importance": a.importance, "incomplete": a.is_incomplete}
-            for a in acts
+            {"title": a.title, "summary": a.body, "status": a.status, "importance": a.importance, "incomplete": bool(a.incomplete)}
+            for a in rows["acts"]
         ],
         "events": [
             {
                 "title": e.title,
-                "description": e.description,
-                "order": (e.ai_suggested_order or e.approx_order),
-                "ai_notes": e.ai_notes,
+                "description": e.body,
+                "order": e.sort_order,
+                "ai_notes": e.notes,
             }
-            for e in events
+            for e in rows["events"]
         ],
         "plot_holes": [
             {
                 "title": h.title,
-                "description": h.description,
+                "description": h.body,
                 "status": h.status,
                 "importance": h.importance,
-                "ai_suggestions": h.ai_suggestions,
+                "ai_suggestions": h.notes,
             }
-            for h in holes
+            for h in rows["plot_holes"]
         ],
     }
 
 
-def answer_story_question(
-    *,
+def _first_turn_lore_version(session: Session, conversation_id: str) -> str | None:
+    """Lore version for the answer cache, or None once the conversation has a thread."""
+    if has_oracle_thread(session, conversation_id):
+        return None
+    return lore_version_token(session)
+
+
+def _prepare_oracle_turn(
     session: Session,
     conversation_id: str,
     question: str,
     context: dict[str, Any],
-) -> str:
-    """Answer a story question using cached oracle instructions via Assistant API."""
-    client = get_openai_client()
-
+) -> tuple[str, str, str]:
+    """Resolve the cached assistant + thread and build the message; returns (assistant_id, thread_id, message)."""
     # Get or create assistant for current oracle instructions
     oracle_instructions = context.get("oracle_instructions", "")
     assistant = get_or_create_oracle_assistant(session, oracle_instructions)
@@ -120,25 +217,130 @@ def answer_story_question(
     # Create filtered context without oracle_instructions (already stored in assistant)
     filtered_context = {k: v for k, v in context.items() if k != "oracle_instructions"}
 
-    # Prepare the user message with question and context
+    # Prepare the user message: fixed instructions first (prompt-cache prefix),
+    # then the retrieved context, with the question last
     user_message = {
-        "question": question,
-        "context": filtered_context,
         "instructions": [
             "Be concise and specific.",
             "When referencing facts, mention which entity it came from (character/concept/act/event/plot hole).",
             "If conflicts exist, point them out explicitly.",
         ],
+        "context": filtered_context,
+        "question": question,
     }
+    return assistant.assistant_id, thread.thread_id, json.dumps(user_message, separators=(",", ":"))
+
+
+def answer_story_question(
+    *,
+    session: Session,
+    conversation_id: str,
+    question: str,
+    context: dict[str, Any],
+) -> str:
+    """Answer a story question using cached oracle instructions via Assistant API."""
+    client = get_openai_client()
+
+    # Semantic cache: a near-identical recent opening question, asked against the
+    # same instructions and story data, reuses its answer. Follow-ups depend on
+    # the thread's history, so only a conversation's first turn takes part.
+    instructions_hash = get_instructions_hash(context.get("oracle_instructions", ""))
+    embedding: list[float] | None = None
+    lore_version = _first_turn_lore_version(session, conversation_id)
+    if lore_version is not None:
+        try:
+            embedding = embed_text(client, question)
+        except Exception:
+            embedding = None
+    cached = None
+    if embedding is not None:
+        cached = find_cached_answer(
+            session, instructions_hash=instructions_hash, lore_version=lore_version, embedding=embedding
+        )
+
+    assistant_id, thread_id, message = _prepare_oracle_turn(session, conversation_id, question, context)
 
     # Add the message to the thread
-    add_message_to_thread(client, thread.thread_id, json.dumps(user_message), "user")
+    add_message_to_thread(client, thread_id, message, "user")
+    if cached is not None:
+        # Record the reused answer as the assistant's turn so follow-ups see the exchange
+        add_message_to_thread(client, thread_id, cached, "assistant")
+        return cached
 
     # Run the assistant and get response
     try:
-        response = run_assistant(client, thread.thread_id, assistant.assistant_id)
-        return response.strip()
+        response = run_assistant(client, thread_id, assistant_id).strip()
     except Exception as e:
         return f"(AI error: {type(e).__name__})"
 
+    if embedding is not None and response:
+        store_cached_answer(
+            session,
+            instructions_hash=instructions_hash,
+            lore_version=lore_version,
+            question=question,
+            embedding=embedding,
+            answer=response,
+        )
+    return response
+
+
+async def aanswer_story_question(
+    *,
+    session: Session,
+    conversation_id: str,
+    question: str,
+    context: dict[str, Any],
+) -> str:
+    """Async variant of answer_story_question; run polling yields to the event loop."""
+    client = get_async_openai_client()
+
+    # The session, the cache scan and the sync client used for assistant/thread
+    # setup all block, so those steps run on a worker thread
+    instructions_hash = get_instructions_hash(context.get("oracle_instructions", ""))
+    embedding: list[float] | None = None
+    lore_version = await anyio.to_thread.run_sync(_first_turn_lore_version, session, conversation_id)
+    if lore_version is not None:
+        try:
+            embedding = await aembed_text(client, question)
+        except Exception:
+            embedding = None
+    cached = None
+    if embedding is not None:
+        cached = await anyio.to_thread.run_sync(
+            partial(
+                find_cached_answer,
+                session,
+                instructions_hash=instructions_hash,
+                lore_version=lore_version,
+                embedding=embedding,
+            )
+        )
+
+    assistant_id, thread_id, message = await anyio.to_thread.run_sync(
+        _prepare_oracle_turn, session, conversation_id, question, context
+    )
+
+    await aadd_message_to_thread(client, thread_id, message, "user")
+    if cached is not None:
+        await aadd_message_to_thread(client, thread_id, cached, "assistant")
+        return cached
+
+    try:
+        response = (await arun_assistant(client, thread_id, assistant_id)).strip()
+    except Exception as e:
+        return f"(AI error: {type(e).__name__})"
 
+    if embedding is not None and response:
+        await anyio.to_thread.run_sync(
+            partial(
+                store_cached_answer,
+                session,
+                instructions_hash=instructions_hash,
+                lore_version=lore_version,
+                question=question,
+                embedding=embedding,
+                answer=response,
+            )
+        )
+    return response
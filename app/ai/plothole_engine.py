@@ -3,36 +3,19 @@ from __future__ import annotations
 import json
 from typing import Any
 
-from app.ai.client import get_openai_client
+from app.ai.client import get_async_openai_client, get_openai_client
 
 
-def brainstorm_plot_hole_solutions(
-    *,
-    plot_hole: dict[str, Any],
-    context: dict[str, Any],
-    model: str = "gpt-4o-mini",
-) -> dict[str, Any]:
-    """
-    plot_hole: {title, description, related_entity_type, related_entity_name?}
-    context: {characters, concepts, acts, events}
-    Returns STRICT JSON:
-      {
-        "solutions": [{"title": str, "details": str}],
-        "tradeoffs": [str],
-        "clarifying_questions": [str]
-      }
-    """
-    client = get_openai_client()
-
+def _brainstorm_messages(plot_hole: dict[str, Any], context: dict[str, Any]) -> list[dict[str, str]]:
     system = (
         "You are a senior story editor and plot doctor. "
         "Generate practical fixes that preserve continuity and strengthen theme/pacing."
     )
 
+    # Prompt-cache prefix: task/schema/constraints are identical on every call;
+    # keep per-call data at the end.
     user = {
         "task": "Brainstorm solutions for this plot hole. Return STRICT JSON only.",
-        "plot_hole": plot_hole,
-        "context": context,
         "output_schema": {
             "solutions": [{"title": "str", "details": "str"}],
             "tradeoffs": ["str"],
@@ -44,17 +27,56 @@ def brainstorm_plot_hole_solutions(
             "Keep tradeoffs concise.",
             "Return only JSON with keys: solutions, tradeoffs, clarifying_questions.",
         ],
+        "plot_hole": plot_hole,
+        "context": context,
     }
 
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": json.dumps(user, separators=(",", ":"))},
+    ]
+
+
+def brainstorm_plot_hole_solutions(
+    *,
+    plot_hole: dict[str, Any],
+    context: dict[str, Any],
+    model: str = "gpt-4o-mini",
+) -> dict[str, Any]:
+    """
+    plot_hole: {title, description, related_entity_type, related_entity_name?}
+    context: {characters, concepts, acts, events}
+    Returns STRICT JSON:
+      {
+        "solutions": [{"title": str, "details": str}],
+        "tradeoffs": [str],
+        "clarifying_questions": [str]
+      }
+    """
+    client = get_openai_client()
     resp = client.chat.completions.create(
         model=model,
         temperature=0.5,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": json.dumps(user)},
-        ],
+        response_format={"type": "json_object"},
+        messages=_brainstorm_messages(plot_hole, context),
     )
     content = (resp.choices[0].message.content or "").strip()
     return json.loads(content)
 
 
+async def abrainstorm_plot_hole_solutions(
+    *,
+    plot_hole: dict[str, Any],
+    context: dict[str, Any],
+    model: str = "gpt-4o-mini",
+) -> dict[str, Any]:
+    """Async variant of brainstorm_plot_hole_solutions, for running alongside other LLM calls."""
+    client = get_async_openai_client()
+    resp = await client.chat.completions.create(
+        model=model,
+        temperature=0.5,
+        response_format={"type": "json_object"},
+        messages=_brainstorm_messages(plot_hole, context),
+    )
+    content = (resp.choices[0].message.content or "").strip()
+    return json.loads(content)
@@ -3,24 +3,10 @@ from __future__ import annotations
 import json
 from typing import Any
 
-from app.ai.client import get_openai_client
+from app.ai.client import get_async_openai_client, get_openai_client
 
 
-def synthesize_and_align_timeline(
-    *,
-    events: list[dict[str, Any]],
-    model: str = "gpt-4o-mini",
-) -> dict[str, Any]:
-    """
-    events: [{id, title, description, approx_order}]
-    Returns:
-      {
-        "aligned": [{"id": int, "suggested_order": int, "notes": str}],
-        "global_notes": str
-      }
-    """
-    client = get_openai_client()
-
+def _synthesize_messages(events: list[dict[str, Any]]) -> list[dict[str, str]]:
     system = (
         "You are a story editor and timeline continuity expert. "
         "Given a list of story events with approximate ordering, you will: "
@@ -28,9 +14,10 @@ def synthesize_and_align_timeline(
         "(3) output a cohesive ordering."
     )
 
+    # Prompt-cache prefix: task/schema/constraints are identical on every call;
+    # keep per-call data at the end.
     user = {
         "task": "Synthesize & Align the timeline. Return STRICT JSON only.",
-        "events": events,
         "output_schema": {
             "aligned": [{"id": "int", "suggested_order": "int", "notes": "str"}],
             "global_notes": "str",
@@ -41,15 +28,34 @@ def synthesize_and_align_timeline(
             "notes should be concise (<= 2 sentences) per event.",
             "Return only JSON with keys: aligned, global_notes.",
         ],
+        "events": events,
     }
 
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": json.dumps(user, separators=(",", ":"))},
+    ]
+
+
+def synthesize_and_align_timeline(
+    *,
+    events: list[dict[str, Any]],
+    model: str = "gpt-4o-mini",
+) -> dict[str, Any]:
+    """
+    events: [{id, title, description, approx_order}]
+    Returns:
+      {
+        "aligned": [{"id": int, "suggested_order": int, "notes": str}],
+        "global_notes": str
+      }
+    """
+    client = get_openai_client()
     resp = client.chat.completions.create(
         model=model,
         temperature=0.2,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": json.dumps(user)},
-        ],
+        response_format={"type": "json_object"},
+        messages=_synthesize_messages(events),
     )
 
     content = resp.choices[0].message.content or ""
@@ -58,3 +64,21 @@ def synthesize_and_align_timeline(
     return json.loads(content)
 
 
+async def asynthesize_and_align_timeline(
+    *,
+    events: list[dict[str, Any]],
+    model: str = "gpt-4o-mini",
+) -> dict[str, Any]:
+    """Async variant of synthesize_and_align_timeline, for running alongside other LLM calls."""
+    client = get_async_openai_client()
+    resp = await client.chat.completions.create(
+        model=model,
+        temperature=0.2,
+        response_format={"type": "json_object"},
+        messages=_synthesize_messages(events),
+    )
+
+    content = resp.choices[0].message.content or ""
+    content = content.strip()
+    # Best-effort JSON parse
+    return json.loads(content)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -11,23 +13,25 @@ class Settings:
     project_root: Path
     sqlite_path: Path
     openai_api_key: str | None
+    debug: bool
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """
     Loads environment variables from a local .env file if present.
+    The result is cached for the life of the process; restart to pick up .env edits.
     """
     load_dotenv(override=False)
 
     project_root = Path(__file__).resolve().parents[2]
     sqlite_path = project_root / "lorekeeper.db"
 
-    import os
-
     return Settings(
         project_root=project_root,
         sqlite_path=sqlite_path,
         openai_api_key=os.getenv("OPENAI_API_KEY") or None,
+        debug=os.getenv("LOREKEEPER_DEBUG", "").lower() in ("1", "true", "yes"),
     )
 
 
@@ -1,20 +1,54 @@
 from __future__ import annotations
 
 from collections.abc import Generator
+from contextlib import contextmanager
+from itertools import product
 
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.core.config import get_settings
 
 
+# Applied to every new DBAPI connection: WAL + relaxed fsync, in-memory temp
+# tables, 256MB mmap, a ~64MB page cache and enforced foreign keys.
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+def _apply_sqlite_pragmas(dbapi_conn, _record) -> None:
+    cursor = dbapi_conn.cursor()
+    for pragma in _SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
 def get_engine():
     settings = get_settings()
     sqlite_url = f"sqlite:///{settings.sqlite_path}"
-    return create_engine(
+    # WAL lets readers run alongside the single writer, so keep a pooled
+    # connection per concurrent request (FastAPI's threadpool runs up to 40
+    # sync handlers) and wait on writer locks instead of failing fast.
+    # LIFO checkout keeps reusing the few most recent connections, whose page
+    # caches are warm, instead of rotating through all of them. No pre-ping:
+    # a local SQLite file has no server side to drop the connection.
+    engine = create_engine(
         sqlite_url,
         echo=False,
-        connect_args={"check_same_thread": False},
+        pool_size=20,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_use_lifo=True,
+        connect_args={"check_same_thread": False, "timeout": 30},
     )
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
 
 
 engine = get_engine()
@@ -26,6 +60,7 @@ def init_db() -> None:
 
     SQLModel.metadata.create_all(engine)
     _run_sqlite_migrations()
+    _ensure_fts_tables()
 
 
 def _run_sqlite_migrations() -> None:
@@ -36,39 +71,61 @@ def _run_sqlite_migrations() -> None:
     """
     from sqlalchemy import text
 
-    def col_exists(table: str, col: str) -> bool:
-        with engine.connect() as conn:
-            rows = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
-        return any(r[1] == col for r in rows)  # r[1] is column name
-
-    def add_col(table: str, ddl: str) -> None:
-        with engine.connect() as conn:
-            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
-            conn.commit()
-
-    # PlotHole.ai_suggestions (added after initial bootstrap)
-    if not col_exists("plothole", "ai_suggestions"):
-        add_col("plothole", "ai_suggestions TEXT NOT NULL DEFAULT ''")
-
-    # Event.act / Event.beat (acts moved into timeline classification)
-    if not col_exists("event", "act"):
-        add_col("event", "act TEXT")
-    if not col_exists("event", "beat"):
-        add_col("event", "beat TEXT")
-
-    # PlotHole.kind (generalized problem type)
-    if not col_exists("plothole", "kind"):
-        add_col("plothole", "kind TEXT NOT NULL DEFAULT 'plot_hole'")
-
-    # Oracle assistant and thread tables for prompt caching
-    def table_exists(table: str) -> bool:
-        with engine.connect() as conn:
-            rows = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name=:table"), {"table": table}).fetchall()
-        return len(rows) > 0
-
-    # Create oracle_assistant table if it doesn't exist
-    if not table_exists("oracleassistant"):
-        with engine.connect() as conn:
+    with engine.begin() as conn:
+        # Schema read once up front: the table set, plus column sets for the
+        # tables that get additive columns below
+        tables = frozenset(r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'")))
+        columns = {
+            t: frozenset(r[1] for r in conn.execute(text(f"PRAGMA table_info({t})")))  # r[1] is column name
+            for t in ("plothole", "event", "oracleanswercache")
+            if t in tables
+        }
+
+        def add_col(table: str, col: str, ddl: str) -> None:
+            if col not in columns.get(table, frozenset()):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} {ddl}"))
+
+        # PlotHole.ai_suggestions (added after initial bootstrap)
+        add_col("plothole", "ai_suggestions", "TEXT NOT NULL DEFAULT ''")
+
+        # Event.act / Event.beat (acts moved into timeline classification)
+        add_col("event", "act", "TEXT")
+        add_col("event", "beat", "TEXT")
+
+        # PlotHole.kind (generalized problem type)
+        add_col("plothole", "kind", "TEXT NOT NULL DEFAULT 'plot_hole'")
+
+        # PlotHole.brainstorm_pending (background brainstorms)
+        add_col("plothole", "brainstorm_pending", "BOOLEAN NOT NULL DEFAULT 0")
+
+        # OracleAnswerCache.lore_version; older rows keep '' and never match again
+        add_col("oracleanswercache", "lore_version", "VARCHAR(64) NOT NULL DEFAULT ''")
+
+        # Case-insensitive exact-match indexes for the auto-entity upserts
+        # (lower(col) = lower(:key) can use these; ILIKE always scans)
+        for table, col in (("character", "name"), ("concept", "title"), ("event", "title"), ("plothole", "title")):
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{col}_lower ON {table} (lower({col}))"))
+        # Timeline sort order (see app.web.routes.timeline._TIMELINE_ORDER); id is the implicit rowid tail
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_event_timeline_order ON event (ai_suggested_order IS NULL, ai_suggested_order, approx_order)"
+        ))
+        # Event.effective_order expression: the scrub filter and its MIN/MAX bounds
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_event_effective_order ON event (coalesce(nullif(ai_suggested_order, 0), approx_order))"
+        ))
+        # Field(index=True) on updated_at: max(updated_at) in the entity-extraction and lore version tokens
+        for table in ("character", "concept", "act", "event", "plothole"):
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)"))
+        # Composite indexes declared in __table_args__ (create_all skips existing tables)
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tagging_entity_tag ON tagging (entity_type, entity_id, tag_id)"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_tagging_entity"))  # prefix of ix_tagging_entity_tag
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tagging_type_tag ON tagging (entity_type, tag_id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_chat_conv_created ON chatmessage (conversation_id, created_at)"))
+        # Its leading column made the old single-column index redundant
+        conn.execute(text("DROP INDEX IF EXISTS ix_chatmessage_conversation_id"))
+
+        # Oracle assistant and thread tables for prompt caching
+        if "oracleassistant" not in tables:
             conn.execute(text("""
                 CREATE TABLE oracleassistant (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -80,11 +137,8 @@ def _run_sqlite_migrations() -> None:
                     updated_at DATETIME NOT NULL
                 )
             """))
-            conn.commit()
 
-    # Create oracle_thread table if it doesn't exist
-    if not table_exists("oraclethread"):
-        with engine.connect() as conn:
+        if "oraclethread" not in tables:
             conn.execute(text("""
                 CREATE TABLE oraclethread (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -95,11 +149,89 @@ def _run_sqlite_migrations() -> None:
                     updated_at DATETIME NOT NULL
                 )
             """))
-            conn.commit()
+
+
+# Full-text search mirrors: external-content FTS5 indexes over these columns,
+# kept in sync by triggers. <table>_fts stems words (porter) for natural-language
+# lookups; <table>_trgm indexes trigrams so list search keeps LIKE '%q%' semantics.
+FTS_COLUMNS: dict[str, tuple[str, ...]] = {
+    "character": ("name", "traits", "arc"),
+    "concept": ("title", "description"),
+    "act": ("title", "summary"),
+    "event": ("title", "description", "ai_notes"),
+    "plothole": ("title", "description", "ai_suggestions"),
+}
+FTS_TOKENIZERS: dict[str, str] = {"fts": "porter unicode61", "trgm": "trigram"}
+
+
+def _ensure_fts_tables() -> None:
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        existing = {
+            r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND (name LIKE '%_fts' OR name LIKE '%_trgm')"))
+        }
+        for (table, cols), (suffix, tokenizer) in product(FTS_COLUMNS.items(), FTS_TOKENIZERS.items()):
+            fts = f"{table}_{suffix}"
+            col_list = ", ".join(cols)
+            new_vals = ", ".join(f"new.{c}" for c in cols)
+            old_vals = ", ".join(f"old.{c}" for c in cols)
+            if fts not in existing:
+                conn.execute(text(f"CREATE VIRTUAL TABLE {fts} USING fts5({col_list}, content='{table}', content_rowid='id', tokenize='{tokenizer}')"))
+                # Index rows that existed before the FTS table
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            conn.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+                END
+            """))
+            conn.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                END
+            """))
+            conn.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                    INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+                END
+            """))
+        conn.commit()
+
+
+@contextmanager
+def session_scope() -> Generator[Session, None, None]:
+    """Read-write session outside a request (background tasks, scripts)."""
+    # Every default is filled in Python, so rows are complete after a commit;
+    # keeping them unexpired spares a re-SELECT (or session.refresh) per write.
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
 
 
 def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+    with session_scope() as session:
+        yield session
+
+
+@contextmanager
+def readonly_session() -> Generator[Session, None, None]:
+    """Session for reads: no autoflush, and loaded rows stay usable after a commit."""
+    with Session(engine, autoflush=False, expire_on_commit=False) as session:
+        yield session
+
+
+def get_readonly_session() -> Generator[Session, None, None]:
+    """readonly_session() as a FastAPI dependency, for GET handlers."""
+    with readonly_session() as session:
         yield session
 
 
+def begin_read_snapshot(session: Session) -> None:
+    """
+    Start an explicit SQLite read transaction on the session's connection, so a
+    run of SELECTs shares one lock and one consistent snapshot. (pysqlite only
+    issues BEGIN before writes; the session's rollback/close ends it.)
+    """
+    dbapi_conn = session.connection().connection.dbapi_connection
+    if not dbapi_conn.in_transaction:
+        dbapi_conn.execute("BEGIN DEFERRED")
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import string
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy.orm import load_only
+from sqlmodel import Session, func, select
 
 from app.models.codex import Character, Concept
 from app.models.common import utcnow
@@ -11,7 +13,15 @@ from app.models.timeline import Event
 
 
 def _norm(s: str | None) -> str:
-    return (s or "").strip()
+    # Most values arrive already stripped; skip the copy for those
+    if s and (s[0].isspace() or s[-1].isspace()):
+        return s.strip()
+    return s or ""
+
+
+def _same_text(col: Any, key: str) -> Any:
+    """Case-insensitive equality served by the ix_<table>_<col>_lower expression indexes."""
+    return func.lower(col) == func.lower(key)
 
 
 def _merge_text(existing: str, incoming: str) -> str:
@@ -21,16 +31,45 @@ def _merge_text(existing: str, incoming: str) -> str:
         return existing
     if not existing:
         return incoming
-    if incoming.lower() in existing.lower():
+    # Case-insensitive containment; a longer incoming text can't be contained,
+    # so skip building the folded copies
+    if len(incoming) <= len(existing) and incoming.casefold() in existing.casefold():
         return existing
     return existing + "\n\n" + incoming
 
 
-def get_or_create_character(session: Session, *, name: str, traits: str = "", arc: str = "") -> tuple[Character, bool]:
-    key = _norm(name)
-    if not key:
-        raise ValueError("Character name required")
-    existing = session.exec(select(Character).where(Character.name.ilike(key))).first()
+# SQLite's lower() only folds ASCII; keys built in Python must match it
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _ci_key(s: str) -> str:
+    return s.translate(_ASCII_LOWER)
+
+
+def _prefetch(session: Session, model: Any, col: Any, keys: list[str], merged: tuple[Any, ...]) -> dict[str, Any]:
+    """
+    Existing rows whose `col` matches any of `keys` case-insensitively, keyed by _ci_key.
+    Only the columns the upsert merges into (`merged`) are loaded; large unrelated
+    text columns (ai_notes, ai_suggestions, ...) stay on disk.
+    """
+    if not keys:
+        return {}
+    wanted = list(dict.fromkeys(_ci_key(k) for k in keys))
+    rows = session.scalars(
+        select(model)
+        .options(load_only(col, *merged))
+        .where(func.lower(col).in_(wanted))
+        .order_by(model.id)
+    )
+    found: dict[str, Any] = {}
+    for row in rows:
+        found.setdefault(_ci_key(getattr(row, col.key)), row)
+    return found
+
+
+# The _upsert_* helpers expect already-_norm'd values; get_or_create_* and
+# persist_extracted_entities normalize once before calling them.
+def _upsert_character(session: Session, existing: Character | None, *, name: str, traits: str, arc: str) -> tuple[Character, bool]:
     if existing:
         changed = False
         new_traits = _merge_text(existing.traits, traits)
@@ -46,47 +85,35 @@ def get_or_create_character(session: Session, *, name: str, traits: str = "", ar
             session.add(existing)
         return existing, False
 
-    c = Character(name=key, traits=_norm(traits), arc=_norm(arc))
+    c = Character(name=name, traits=traits, arc=arc)
     session.add(c)
-    session.commit()
-    session.refresh(c)
     return c, True
 
 
-def get_or_create_concept(session: Session, *, title: str, description: str = "") -> tuple[Concept, bool]:
-    key = _norm(title)
-    if not key:
-        raise ValueError("Concept title required")
-    existing = session.exec(select(Concept).where(Concept.title.ilike(key))).first()
+def _upsert_concept(session: Session, existing: Concept | None, *, title: str, description: str) -> tuple[Concept, bool]:
     if existing:
         new_desc = _merge_text(existing.description, description)
         if new_desc != (existing.description or ""):
             existing.description = new_desc
             existing.updated_at = utcnow()
             session.add(existing)
-            session.commit()
         return existing, False
 
-    c = Concept(title=key, description=_norm(description))
+    c = Concept(title=title, description=description)
     session.add(c)
-    session.commit()
-    session.refresh(c)
     return c, True
 
 
-def get_or_create_event(
+def _upsert_event(
     session: Session,
+    existing: Event | None,
     *,
     title: str,
-    description: str = "",
-    act: str | None = None,
-    beat: str | None = None,
-    approx_order: int = 0,
+    description: str,
+    act: str | None,
+    beat: str | None,
+    approx_order: int,
 ) -> tuple[Event, bool]:
-    key = _norm(title)
-    if not key:
-        raise ValueError("Event title required")
-    existing = session.exec(select(Event).where(Event.title.ilike(key))).first()
     if existing:
         changed = False
         new_desc = _merge_text(existing.description, description)
@@ -105,97 +132,165 @@ def get_or_create_event(
         if changed:
             existing.updated_at = utcnow()
             session.add(existing)
-            session.commit()
         return existing, False
 
     e = Event(
-        title=key,
-        description=_norm(description),
-        act=_norm(act) or None,
-        beat=_norm(beat) or None,
+        title=title,
+        description=description,
+        act=act or None,
+        beat=beat or None,
         approx_order=int(approx_order or 0),
     )
     session.add(e)
-    session.commit()
-    session.refresh(e)
     return e, True
 
 
-def get_or_create_plot_hole(
-    session: Session, *, title: str, description: str = "", kind: str = "plot_hole"
+def _upsert_plot_hole(
+    session: Session, existing: PlotHole | None, *, title: str, description: str, kind: str
 ) -> tuple[PlotHole, bool]:
-    key = _norm(title)
-    if not key:
-        raise ValueError("Plot hole title required")
-    existing = session.exec(select(PlotHole).where(PlotHole.title.ilike(key))).first()
     if existing:
+        changed = False
         # Update kind if it's still default or missing
-        if kind and (not getattr(existing, "kind", None) or existing.kind == "plot_hole"):
+        if kind and (not getattr(existing, "kind", None) or existing.kind == "plot_hole") and existing.kind != kind:
             existing.kind = kind
-            existing.updated_at = utcnow()
-            session.add(existing)
-            session.commit()
+            changed = True
         new_desc = _merge_text(existing.description, description)
         if new_desc != (existing.description or ""):
             existing.description = new_desc
+            changed = True
+        if changed:
             existing.updated_at = utcnow()
             session.add(existing)
-            session.commit()
         return existing, False
 
-    h = PlotHole(title=key, description=_norm(description), kind=_norm(kind) or "plot_hole")
+    h = PlotHole(title=title, description=description, kind=kind or "plot_hole")
     session.add(h)
-    session.commit()
-    session.refresh(h)
     return h, True
 
 
+def _commit_created(session: Session, obj: Any, was_created: bool) -> None:
+    # Unchanged existing rows need no commit (and no fsync). The INSERT already
+    # filled in the id, so there is nothing to refresh.
+    if was_created or session.is_modified(obj):
+        session.commit()
+
+
+def get_or_create_character(session: Session, *, name: str, traits: str = "", arc: str = "") -> tuple[Character, bool]:
+    key = _norm(name)
+    if not key:
+        raise ValueError("Character name required")
+    existing = session.exec(select(Character).where(_same_text(Character.name, key))).first()
+    obj, was_created = _upsert_character(session, existing, name=key, traits=_norm(traits), arc=_norm(arc))
+    _commit_created(session, obj, was_created)
+    return obj, was_created
+
+
+def get_or_create_concept(session: Session, *, title: str, description: str = "") -> tuple[Concept, bool]:
+    key = _norm(title)
+    if not key:
+        raise ValueError("Concept title required")
+    existing = session.exec(select(Concept).where(_same_text(Concept.title, key))).first()
+    obj, was_created = _upsert_concept(session, existing, title=key, description=_norm(description))
+    _commit_created(session, obj, was_created)
+    return obj, was_created
+
+
+def get_or_create_event(
+    session: Session,
+    *,
+    title: str,
+    description: str = "",
+    act: str | None = None,
+    beat: str | None = None,
+    approx_order: int = 0,
+) -> tuple[Event, bool]:
+    key = _norm(title)
+    if not key:
+        raise ValueError("Event title required")
+    existing = session.exec(select(Event).where(_same_text(Event.title, key))).first()
+    obj, was_created = _upsert_event(
+        session,
+        existing,
+        title=key,
+        description=_norm(description),
+        act=_norm(act) or None,
+        beat=_norm(beat) or None,
+        approx_order=approx_order,
+    )
+    _commit_created(session, obj, was_created)
+    return obj, was_created
+
+
+def get_or_create_plot_hole(
+    session: Session, *, title: str, description: str = "", kind: str = "plot_hole"
+) -> tuple[PlotHole, bool]:
+    key = _norm(title)
+    if not key:
+        raise ValueError("Plot hole title required")
+    existing = session.exec(select(PlotHole).where(_same_text(PlotHole.title, key))).first()
+    obj, was_created = _upsert_plot_hole(session, existing, title=key, description=_norm(description), kind=_norm(kind))
+    _commit_created(session, obj, was_created)
+    return obj, was_created
+
+
 def persist_extracted_entities(session: Session, extracted: dict[str, Any]) -> dict[str, Any]:
     """
     Persists extracted entities into the DB (upsert-ish).
+    Existing rows are prefetched with one query per kind and everything is
+    committed once at the end.
     Returns a summary:
       {"created": {"characters":[name],...}, "updated": {...}}
     """
     created: dict[str, list[str]] = {"characters": [], "concepts": [], "events": [], "plot_holes": []}
     updated: dict[str, list[str]] = {"characters": [], "concepts": [], "events": [], "plot_holes": []}
 
-    # For description enrichment (so entity pages show clickable @mentions)
-    mention_names: list[str] = []
-    for row in extracted.get("characters") or []:
-        n = _norm(row.get("name"))
-        if n:
-            mention_names.append(n)
-    for row in extracted.get("concepts") or []:
-        t = _norm(row.get("title"))
-        if t:
-            mention_names.append(t)
-
-    for row in extracted.get("characters") or []:
-        name = _norm(row.get("name"))
-        if not name:
-            continue
+    def rows_with(kind: str, field: str) -> list[tuple[str, dict[str, Any]]]:
+        out = []
+        for row in extracted.get(kind) or []:
+            key = _norm(row.get(field))
+            if key:
+                out.append((key, row))
+        return out
+
+    char_rows = rows_with("characters", "name")
+    concept_rows = rows_with("concepts", "title")
+    event_rows = rows_with("events", "title")
+    hole_rows = rows_with("plot_holes", "title")
+
+    # For description enrichment (so entity pages show clickable @mentions);
+    # the same suffix goes on every event, so build it once
+    mention_names: list[str] = [n for n, _ in char_rows] + [t for t, _ in concept_rows]
+    mentions_suffix = ("Mentions: " + ", ".join(f"@{{{n}}}" for n in mention_names[:6])) if mention_names else ""
+
+    # Rows created earlier in this batch are added to the maps too, so repeated
+    # names merge into one record just as the per-row lookups did.
+    chars = _prefetch(session, Character, Character.name, [n for n, _ in char_rows], (Character.traits, Character.arc))
+    for name, row in char_rows:
         traits = _norm(row.get("traits"))
         arc = _norm(row.get("arc"))
-        obj, was_created = get_or_create_character(session, name=name, traits=traits, arc=arc)
+        obj, was_created = _upsert_character(session, chars.get(_ci_key(name)), name=name, traits=traits, arc=arc)
+        chars[_ci_key(name)] = obj
         (created if was_created else updated)["characters"].append(obj.name)
 
-    for row in extracted.get("concepts") or []:
-        title = _norm(row.get("title"))
-        if not title:
-            continue
+    concepts = _prefetch(session, Concept, Concept.title, [t for t, _ in concept_rows], (Concept.description,))
+    for title, row in concept_rows:
         description = _norm(row.get("description"))
-        obj, was_created = get_or_create_concept(session, title=title, description=description)
+        obj, was_created = _upsert_concept(session, concepts.get(_ci_key(title)), title=title, description=description)
+        concepts[_ci_key(title)] = obj
         (created if was_created else updated)["concepts"].append(obj.title)
 
-    for row in extracted.get("events") or []:
-        title = _norm(row.get("title"))
-        if not title:
-            continue
+    events = _prefetch(
+        session,
+        Event,
+        Event.title,
+        [t for t, _ in event_rows],
+        (Event.description, Event.act, Event.beat, Event.approx_order),
+    )
+    for title, row in event_rows:
         description = _norm(row.get("description"))
         # Add mention hints if not already present
-        if mention_names and "@{" not in description:
-            mentions = ", ".join([f"@{{{n}}}" for n in mention_names[:6]])
-            description = _merge_text(description, f"Mentions: {mentions}")
+        if mentions_suffix and "@{" not in description:
+            description = _merge_text(description, mentions_suffix)
         act = _norm(row.get("act")) or None
         beat = _norm(row.get("beat")) or None
         approx_order = row.get("approx_order") or 0
@@ -203,25 +298,27 @@ def persist_extracted_entities(session: Session, extracted: dict[str, Any]) -> d
             approx_order_i = int(approx_order)
         except Exception:
             approx_order_i = 0
-        obj, was_created = get_or_create_event(
+        obj, was_created = _upsert_event(
             session,
+            events.get(_ci_key(title)),
             title=title,
             description=description,
             act=act,
             beat=beat,
             approx_order=approx_order_i,
         )
+        events[_ci_key(title)] = obj
         (created if was_created else updated)["events"].append(obj.title)
 
-    for row in extracted.get("plot_holes") or []:
-        title = _norm(row.get("title"))
-        if not title:
-            continue
+    holes = _prefetch(session, PlotHole, PlotHole.title, [t for t, _ in hole_rows], (PlotHole.description, PlotHole.kind))
+    for title, row in hole_rows:
         description = _norm(row.get("description"))
         kind = _norm(row.get("kind")) or "plot_hole"
-        obj, was_created = get_or_create_plot_hole(session, title=title, description=description, kind=kind)
+        obj, was_created = _upsert_plot_hole(
+            session, holes.get(_ci_key(title)), title=title, description=description, kind=kind
+        )
+        holes[_ci_key(title)] = obj
         (created if was_created else updated)["plot_holes"].append(obj.title)
 
+    session.commit()
     return {"created": created, "updated": updated}
-
-
@@ -1,19 +1,37 @@
 from __future__ import annotations
 
-from typing import Sequence
+import io
+from typing import Any, Sequence
 
 from sqlmodel import Session, select
 
-from app.ai.bible_editor import parse_document_into_sections
+from app.ai.bible_editor import bible_version_token, parse_document_into_sections
 from app.models.bible import BibleSection
 from app.models.common import utcnow
 
 
+# Engine URL -> (version token, section field dicts); see get_bible_sections.
+# Plain snapshots rather than ORM instances, which belong to the session (and
+# thread) that loaded them.
+_SECTIONS_CACHE: dict[str, tuple[str, tuple[dict[str, Any], ...]]] = {}
+
+
 def get_bible_sections(session: Session) -> Sequence[BibleSection]:
-    """Get all bible sections ordered by their position."""
-    return session.exec(
-        select(BibleSection).order_by(BibleSection.order)
-    ).all()
+    """
+    Get all bible sections ordered by their position.
+    The rows are cached until a section is added, removed or updated; each call
+    gets fresh unattached instances built from the cached snapshot.
+    """
+    cache_key = str(session.get_bind().url)
+    token = bible_version_token(session)
+    cached = _SECTIONS_CACHE.get(cache_key)
+    if cached is None or cached[0] != token:
+        sections = session.exec(
+            select(BibleSection).order_by(BibleSection.order)
+        ).all()
+        cached = (token, tuple(section.model_dump() for section in sections))
+        _SECTIONS_CACHE[cache_key] = cached
+    return [BibleSection(**fields) for fields in cached[1]]
 
 
 def get_bible_section_by_id(session: Session, section_id: int) -> BibleSection | None:
@@ -47,7 +65,6 @@ def create_or_update_bible_section(
         existing.updated_at = utcnow()
         session.add(existing)
         session.commit()
-        session.refresh(existing)
         return existing
     else:
         # Create new
@@ -59,7 +76,6 @@ def create_or_update_bible_section(
         )
         session.add(section)
         session.commit()
-        session.refresh(section)
         return section
 
 
@@ -82,17 +98,21 @@ def import_bible_from_text(session: Session, full_text: str) -> Sequence[BibleSe
 
 
 def get_full_bible_text(session: Session) -> str:
-    """Get the full bible as formatted text."""
-    sections = get_bible_sections(session)
+    """Get the full bible as formatted text (streamed from the two columns it needs)."""
+    rows = session.exec(
+        select(BibleSection.section_name, BibleSection.content).order_by(BibleSection.order)
+    )
 
-    full_text = []
-    for section in sections:
-        if section.section_name == "Intro/Uncategorized":
-            full_text.append(section.content)
-        else:
-            full_text.append(f"{section.section_name}\n{section.content}")
+    buf = io.StringIO()
+    for i, (section_name, content) in enumerate(rows):
+        if i:
+            buf.write("\n\n")
+        if section_name != "Intro/Uncategorized":
+            buf.write(section_name)
+            buf.write("\n")
+        buf.write(content)
 
-    return "\n\n".join(full_text)
+    return buf.getvalue()
 
 
 def update_bible_section_content(session: Session, section_id: int, content: str) -> BibleSection | None:
@@ -103,7 +123,6 @@ def update_bible_section_content(session: Session, section_id: int, content: str
         section.updated_at = utcnow()
         session.add(section)
         session.commit()
-        session.refresh(section)
     return section
 
 
@@ -1,22 +1,30 @@
 from __future__ import annotations
 
 import hashlib
+from array import array
+from datetime import timedelta
+from functools import lru_cache
 
-from sqlmodel import Session, select
+from sqlmodel import Session, delete, func, select
 
 from app.ai.client import (
+    create_bible_editor_assistant,
     create_oracle_assistant,
     delete_oracle_assistant,
     get_openai_client,
     update_oracle_assistant,
 )
+from app.models.codex import Act, Character, Concept
 from app.models.common import utcnow
-from app.models.oracle import OracleAssistant, OracleThread
+from app.models.oracle import BibleEditorAssistant, OracleAnswerCache, OracleAssistant, OracleThread
+from app.models.problems import PlotHole
+from app.models.timeline import Event
 
 
+@lru_cache(maxsize=32)
 def get_instructions_hash(instructions: str) -> str:
-    """Generate a hash of the instructions for change detection."""
-    return hashlib.sha256(instructions.strip().encode()).hexdigest()[:16]
+    """Generate a hash of the instructions for change detection (memoized; prompts rarely change)."""
+    return hashlib.blake2b(instructions.strip().encode(), digest_size=8).hexdigest()
 
 
 def get_or_create_oracle_assistant(session: Session, instructions: str, model: str = "gpt-4o-mini") -> OracleAssistant:
@@ -48,7 +56,6 @@ def get_or_create_oracle_assistant(session: Session, instructions: str, model: s
             existing_assistant.updated_at = utcnow()
             session.add(existing_assistant)
             session.commit()
-            session.refresh(existing_assistant)
             return existing_assistant
         except Exception:
             # If update fails, create a new one
@@ -65,12 +72,55 @@ def get_or_create_oracle_assistant(session: Session, instructions: str, model: s
         )
         session.add(assistant)
         session.commit()
-        session.refresh(assistant)
         return assistant
     except Exception as e:
         raise RuntimeError(f"Failed to create oracle assistant: {e}")
 
 
+def get_or_create_bible_editor_assistant(
+    session: Session, instructions: str, model: str = "gpt-4o"
+) -> BibleEditorAssistant:
+    """Get the bible editor assistant, refreshing its instructions when the bible changed."""
+    instructions = instructions.strip()
+    instructions_hash = get_instructions_hash(instructions)
+
+    existing = session.exec(select(BibleEditorAssistant)).first()
+    if existing and existing.instructions_hash == instructions_hash:
+        return existing
+
+    client = get_openai_client()
+
+    if existing:
+        try:
+            update_oracle_assistant(client, existing.assistant_id, instructions)
+            existing.instructions_hash = instructions_hash
+            existing.updated_at = utcnow()
+            session.add(existing)
+            session.commit()
+            return existing
+        except Exception:
+            # Remote assistant is unusable; replace it, deleting it remotely if it still exists
+            try:
+                delete_oracle_assistant(client, existing.assistant_id)
+            except Exception:
+                pass
+            session.delete(existing)
+            session.commit()
+
+    try:
+        assistant_id = create_bible_editor_assistant(client, instructions, model)
+        assistant = BibleEditorAssistant(
+            assistant_id=assistant_id,
+            instructions_hash=instructions_hash,
+            model=model,
+        )
+        session.add(assistant)
+        session.commit()
+        return assistant
+    except Exception as e:
+        raise RuntimeError(f"Failed to create bible editor assistant: {e}")
+
+
 def get_oracle_thread(session: Session, conversation_id: str, assistant_id: str) -> OracleThread | None:
     """Get an existing thread for a conversation."""
     return session.exec(
@@ -95,10 +145,16 @@ def create_oracle_thread(session: Session, conversation_id: str, assistant_id: s
     )
     session.add(thread)
     session.commit()
-    session.refresh(thread)
     return thread
 
 
+def has_oracle_thread(session: Session, conversation_id: str) -> bool:
+    """True once a conversation has asked the oracle anything (under any assistant)."""
+    return session.exec(
+        select(OracleThread.id).where(OracleThread.conversation_id == conversation_id).limit(1)
+    ).first() is not None
+
+
 def get_or_create_oracle_thread(session: Session, conversation_id: str, assistant_id: str) -> OracleThread:
     """Get or create a thread for a conversation."""
     thread = get_oracle_thread(session, conversation_id, assistant_id)
@@ -128,3 +184,76 @@ def cleanup_old_assistants(session: Session, keep_recent: int = 3) -> None:
             pass
 
     session.commit()
+
+
+# Semantic answer cache: only a conversation's first question is answered from
+# it (later ones depend on the thread's history), entries are tied to the story
+# data they were built from, and they expire after an hour; only the most
+# recent rows are compared.
+ANSWER_CACHE_TTL = timedelta(hours=1)
+ANSWER_CACHE_SCAN = 200
+
+# What build_rag_lite_context reads
+_LORE_MODELS = (Character, Concept, Act, Event, PlotHole)
+
+
+def lore_version_token(session: Session) -> str:
+    """
+    Changes on any insert, delete or edit of the oracle's story data: max id,
+    row count and latest updated_at of each table, all answered from indexes.
+    """
+    cols = []
+    for model in _LORE_MODELS:
+        cols += [
+            select(func.max(model.id)).scalar_subquery(),
+            select(func.count()).select_from(model).scalar_subquery(),
+            select(func.max(model.updated_at)).scalar_subquery(),
+        ]
+    fingerprint = repr(tuple(session.exec(select(*cols)).one()))
+    return hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()
+
+
+def find_cached_answer(
+    session: Session, *, instructions_hash: str, lore_version: str, embedding: list[float], threshold: float = 0.95
+) -> str | None:
+    """Return a recent answer whose question embedding has cosine similarity >= threshold."""
+    cutoff = utcnow() - ANSWER_CACHE_TTL
+    rows = session.exec(
+        select(OracleAnswerCache.embedding, OracleAnswerCache.answer)
+        .where(
+            OracleAnswerCache.instructions_hash == instructions_hash,
+            OracleAnswerCache.lore_version == lore_version,
+            OracleAnswerCache.created_at >= cutoff,
+        )
+        .order_by(OracleAnswerCache.created_at.desc())
+        .limit(ANSWER_CACHE_SCAN)
+    ).all()
+
+    best_score, best_answer = threshold, None
+    for blob, answer in rows:
+        vec = array("f")
+        vec.frombytes(blob)
+        if len(vec) != len(embedding):
+            continue
+        # Embeddings are unit length, so the dot product is the cosine similarity
+        score = sum(a * b for a, b in zip(vec, embedding))
+        if score >= best_score:
+            best_score, best_answer = score, answer
+    return best_answer
+
+
+def store_cached_answer(
+    session: Session, *, instructions_hash: str, lore_version: str, question: str, embedding: list[float], answer: str
+) -> None:
+    """Remember an answer and drop expired ones."""
+    session.exec(delete(OracleAnswerCache).where(OracleAnswerCache.created_at < utcnow() - ANSWER_CACHE_TTL))
+    session.add(
+        OracleAnswerCache(
+            instructions_hash=instructions_hash,
+            lore_version=lore_version,
+            question=question,
+            embedding=array("f", embedding).tobytes(),
+            answer=answer,
+        )
+    )
+    session.commit()
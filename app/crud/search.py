@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from sqlalchemy import column, literal_column, table
+from sqlmodel import select
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Question words and fillers that would otherwise match nearly every row
+_STOPWORDS = frozenset(
+    {
+        "about", "and", "are", "can", "could", "did", "does", "for", "from", "has", "have",
+        "how", "into", "not", "should", "that", "the", "their", "them", "then", "there",
+        "they", "this", "was", "were", "what", "when", "where", "which", "who", "whom", "why",
+        "will", "with", "would", "you", "your",
+    }
+)
+
+
+def fts_query(text: str | None) -> str | None:
+    """
+    Turns free text into an FTS5 MATCH expression (OR of quoted terms).
+    Returns None when nothing searchable is left.
+    """
+    terms = [t for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 2 and t not in _STOPWORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+
+def fts_substring_query(text: str | None, columns: tuple[str, ...] = ()) -> str | None:
+    """
+    MATCH expression for a <table>_trgm mirror that finds `text` anywhere, like
+    a case-insensitive LIKE '%text%', optionally restricted to `columns`.
+    Returns None under 3 characters, which trigrams cannot match; callers keep
+    the LIKE for those.
+    """
+    if not text or len(text) < 3:
+        return None
+    phrase = '"' + text.replace('"', '""') + '"'
+    return f"{{{' '.join(columns)}}} : {phrase}" if columns else phrase
+
+
+def fts_rowids(table_name: str, match: str, *, mirror: str = "fts") -> Any:
+    """
+    SELECT of the row ids in `table_name` whose FTS mirror matches: "fts" for
+    stemmed word queries, "trgm" for fts_substring_query (see app.core.db).
+    """
+    fts = f"{table_name}_{mirror}"
+    t = table(fts, column("rowid"))
+    return select(t.c.rowid).where(literal_column(fts).op("MATCH")(match))
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from sqlmodel import Session
+from datetime import datetime
+
+from sqlmodel import Session, select
 
 from app.models.common import utcnow
 from app.models.settings import AppSettings
@@ -8,6 +10,10 @@ from app.models.settings import AppSettings
 
 SETTINGS_ID = 1
 
+# Engine URL -> (updated_at, stripped oracle instructions). The row is checked
+# through its indexed updated_at, so other workers' writes are still seen.
+_INSTRUCTIONS_CACHE: dict[str, tuple[datetime, str]] = {}
+
 
 def get_app_settings(session: Session) -> AppSettings:
     s = session.get(AppSettings, SETTINGS_ID)
@@ -16,13 +22,20 @@ def get_app_settings(session: Session) -> AppSettings:
     s = AppSettings(id=SETTINGS_ID, oracle_instructions="")
     session.add(s)
     session.commit()
-    session.refresh(s)
     return s
 
 
 def get_oracle_instructions(session: Session) -> str:
+    cache_key = str(session.get_bind().url)
+    version = session.exec(select(AppSettings.updated_at).where(AppSettings.id == SETTINGS_ID)).first()
+    cached = _INSTRUCTIONS_CACHE.get(cache_key)
+    if version is not None and cached and cached[0] == version:
+        return cached[1]
+
     s = get_app_settings(session)
-    return (s.oracle_instructions or "").strip()
+    text = (s.oracle_instructions or "").strip()
+    _INSTRUCTIONS_CACHE[cache_key] = (s.updated_at, text)
+    return text
 
 
 def set_oracle_instructions(session: Session, text: str) -> AppSettings:
@@ -31,7 +44,5 @@ def set_oracle_instructions(session: Session, text: str) -> AppSettings:
     s.updated_at = utcnow()
     session.add(s)
     session.commit()
-    session.refresh(s)
+    _INSTRUCTIONS_CACHE[str(session.get_bind().url)] = (s.updated_at, s.oracle_instructions.strip())
     return s
-
-
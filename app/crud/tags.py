@@ -1,8 +1,31 @@
 from __future__ import annotations
 
-from sqlmodel import Session, select
+from collections import defaultdict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import and_, event, exists, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, delete, select
 
 from app.models.codex import Tag, Tagging
+from app.models.common import utcnow
+
+
+# Per-session memo of {(entity_type, entity_id): sorted tag names}. A request's
+# session often reads the same entity's tags more than once (set_entity_tags'
+# unchanged check, then the row re-render); writes below keep it current.
+_TAG_CACHE = "lorekeeper.tag_names"
+
+
+def _tag_cache(session: Session) -> dict[tuple[str, int], tuple[str, ...]]:
+    return session.info.setdefault(_TAG_CACHE, {})
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_tag_cache(session: Session, previous_transaction: Any) -> None:
+    # Rolled-back writes may have been cached
+    session.info.pop(_TAG_CACHE, None)
 
 
 def parse_tag_names(raw: str | None) -> list[str]:
@@ -22,65 +45,167 @@ def parse_tag_names(raw: str | None) -> list[str]:
     return dedup
 
 
+def _upsert_tags(session: Session, names: list[str], now: datetime) -> dict[str, int]:
+    """
+    Insert any missing tags and return {name: id} for all of `names` in one
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement.
+    The no-op update (rather than DO NOTHING) makes existing rows come back too.
+    """
+    if not names:
+        return {}
+    stmt = sqlite_insert(Tag).values([{"name": n, "created_at": now} for n in names])
+    stmt = stmt.on_conflict_do_update(index_elements=[Tag.name], set_={"name": stmt.excluded.name})
+    return {name: tag_id for tag_id, name in session.exec(stmt.returning(Tag.id, Tag.name))}
+
+
 def get_or_create_tag(session: Session, name: str) -> Tag:
-    existing = session.exec(select(Tag).where(Tag.name == name)).first()
-    if existing:
-        return existing
-    tag = Tag(name=name)
-    session.add(tag)
+    # Same upsert as _upsert_tags, but RETURNING the whole row loads the Tag
+    # directly; expire_on_commit=False keeps it usable without a re-SELECT.
+    stmt = sqlite_insert(Tag).values(name=name, created_at=utcnow())
+    stmt = stmt.on_conflict_do_update(index_elements=[Tag.name], set_={"name": stmt.excluded.name})
+    tag = session.scalars(select(Tag).from_statement(stmt.returning(Tag))).one()
     session.commit()
-    session.refresh(tag)
     return tag
 
 
+def clear_entity_tags(session: Session, *, entity_type: str, entity_id: int) -> None:
+    """Delete every tagging of one entity in a single statement; the caller commits."""
+    session.exec(
+        delete(Tagging).where(
+            Tagging.entity_type == entity_type,
+            Tagging.entity_id == entity_id,
+        )
+    )
+    _tag_cache(session)[(entity_type, entity_id)] = ()
+
+
 def set_entity_tags(
     session: Session,
     *,
     entity_type: str,
     entity_id: int,
     tag_names: list[str],
+    commit: bool = True,
+    now: datetime | None = None,
 ) -> None:
-    # remove all old
-    old = session.exec(
-        select(Tagging).where(
-            Tagging.entity_type == entity_type,
-            Tagging.entity_id == entity_id,
-        )
-    ).all()
-    for o in old:
-        session.delete(o)
-    session.commit()
+    """
+    Replace an entity's tags; pass commit=False to fold this into the caller's
+    transaction, and `now` to stamp new rows with the caller's own timestamp.
+    """
+    names = list(dict.fromkeys(tag_names))
 
-    # add new
-    for name in tag_names:
-        tag = get_or_create_tag(session, name)
-        session.add(Tagging(tag_id=tag.id, entity_type=entity_type, entity_id=entity_id))
-    session.commit()
+    # Most edits leave the tags alone: one indexed read instead of the three writes below
+    if sorted(names) == get_entity_tag_names(session, entity_type=entity_type, entity_id=entity_id):
+        if commit:
+            session.commit()
+        return
+
+    # remove all old in one statement
+    clear_entity_tags(session, entity_type=entity_type, entity_id=entity_id)
+
+    # resolve (and create missing) tags in one statement; one timestamp for tags and taggings
+    now = now or utcnow()
+    tag_ids = _upsert_tags(session, names, now)
+
+    # add new as one executemany INSERT, skipping ORM object construction and flush
+    if names:
+        session.exec(
+            insert(Tagging),
+            params=[
+                {"tag_id": tag_ids[n], "entity_type": entity_type, "entity_id": entity_id, "created_at": now}
+                for n in names
+            ],
+        )
+    _tag_cache(session)[(entity_type, entity_id)] = tuple(sorted(names))
+    if commit:
+        session.commit()
 
 
 def get_entity_tag_names(session: Session, *, entity_type: str, entity_id: int) -> list[str]:
-    tag_ids = session.exec(
-        select(Tagging.tag_id).where(
-            Tagging.entity_type == entity_type,
-            Tagging.entity_id == entity_id,
+    cache = _tag_cache(session)
+    key = (entity_type, entity_id)
+    if key not in cache:
+        cache[key] = tuple(
+            session.exec(
+                select(Tag.name)
+                .join(Tagging, Tagging.tag_id == Tag.id)
+                .where(
+                    Tagging.entity_type == entity_type,
+                    Tagging.entity_id == entity_id,
+                )
+                .order_by(Tag.name)
+                .distinct()
+            ).all()
         )
+    return list(cache[key])
+
+
+def get_with_tag_names(session: Session, model: Any, *, entity_type: str, entity_id: int) -> tuple[Any | None, list[str]]:
+    """
+    session.get(model, entity_id) plus get_entity_tag_names as one LEFT JOIN
+    round trip; (None, []) if the row is missing. When the tags are already
+    memoized only the row is fetched (often straight from the identity map).
+    """
+    cache = _tag_cache(session)
+    key = (entity_type, entity_id)
+    if key in cache:
+        obj = session.get(model, entity_id)
+        return obj, list(cache[key]) if obj else []
+    rows = session.exec(
+        select(model, Tag.name)
+        .outerjoin(Tagging, and_(Tagging.entity_type == entity_type, Tagging.entity_id == model.id))
+        .outerjoin(Tag, Tag.id == Tagging.tag_id)
+        .where(model.id == entity_id)
+        .order_by(Tag.name)
     ).all()
-    if not tag_ids:
-        return []
-    tags = session.exec(select(Tag).where(Tag.id.in_(tag_ids)).order_by(Tag.name)).all()
-    return [t.name for t in tags]
+    if not rows:
+        return None, []
+    cache[key] = tuple(dict.fromkeys(name for _, name in rows if name is not None))
+    return rows[0][0], list(cache[key])
 
 
-def filter_entity_ids_by_tag(session: Session, *, entity_type: str, tag_name: str) -> list[int]:
-    tag = session.exec(select(Tag).where(Tag.name == tag_name)).first()
-    if not tag:
-        return []
-    ids = session.exec(
-        select(Tagging.entity_id).where(
-            Tagging.entity_type == entity_type,
-            Tagging.tag_id == tag.id,
+# Stays under SQLITE_MAX_VARIABLE_NUMBER on builds older than 3.32 (default 999)
+_IN_CHUNK = 900
+
+
+def get_entity_tag_names_bulk(session: Session, *, entity_type: str, entity_ids: list[int]) -> dict[int, tuple[str, ...]]:
+    """
+    get_entity_tag_names for many entities: {entity_id: sorted names}, only for
+    entities that have tags. Names come sorted from SQL and as tuples (templates
+    only iterate them), shared with the session memo rather than copied.
+    One query per _IN_CHUNK ids, so a single query for any normal list.
+    """
+    grouped: defaultdict[int, list[str]] = defaultdict(list)
+    for start in range(0, len(entity_ids), _IN_CHUNK):
+        rows = session.exec(
+            select(Tagging.entity_id, Tag.name)
+            .join(Tag, Tag.id == Tagging.tag_id)
+            .where(
+                Tagging.entity_type == entity_type,
+                Tagging.entity_id.in_(entity_ids[start : start + _IN_CHUNK]),
+            )
+            .order_by(Tagging.entity_id, Tag.name)
+            .distinct()
         )
-    ).all()
-    return list(ids)
+        for entity_id, name in rows:
+            grouped[entity_id].append(name)
+    tags_by_id = {entity_id: tuple(names) for entity_id, names in grouped.items()}
+    cache = _tag_cache(session)
+    for entity_id in entity_ids:
+        cache[(entity_type, entity_id)] = tags_by_id.get(entity_id, ())
+    return tags_by_id
+
 
+def has_tag(*, entity_type: str, entity_id: Any, tag_name: str) -> Any:
+    """
+    Correlated EXISTS for `stmt.where(...)`: the row whose id column is `entity_id`
+    carries the tag `tag_name`. Lets SQLite filter in-query instead of shipping
+    a materialized id list back as IN (...) parameters.
+    """
+    return exists().where(
+        Tagging.entity_type == entity_type,
+        Tagging.entity_id == entity_id,
+        Tagging.tag_id == Tag.id,
+        Tag.name == tag_name,
+    )
 
@@ -5,10 +5,8 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
-from app.core.config import get_settings
 from app.core.db import init_db
 from app.web.routes.bible import router as bible_router
 from app.web.routes.chat import router as chat_router
@@ -17,10 +15,7 @@ from app.web.routes.map import router as map_router
 from app.web.routes.mentions import router as mentions_router
 from app.web.routes.problems import router as problems_router
 from app.web.routes.timeline import router as timeline_router
-
-
-settings = get_settings()
-templates = Jinja2Templates(directory=str(Path(__file__).parent / "web" / "templates"))
+from app.web.templating import templates
 
 
 @asynccontextmanager
@@ -51,7 +46,7 @@ app.include_router(map_router)
 def home(request: Request):
     return templates.TemplateResponse(
         "home.html",
-        {"request": request, "title": "LoreKeeper", "db_path": str(settings.sqlite_path)},
+        {"request": request, "title": "LoreKeeper"},
     )
 
 
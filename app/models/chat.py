@@ -2,14 +2,19 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 from app.models.common import utcnow
 
 
 class ChatMessage(SQLModel, table=True):
+    # Conversation history is always read as "this conversation, oldest first";
+    # the composite also serves plain conversation_id lookups (its leading column).
+    __table_args__ = (Index("ix_chat_conv_created", "conversation_id", "created_at"),)
+
     id: int | None = Field(default=None, primary_key=True)
-    conversation_id: str = Field(index=True, max_length=64)
+    conversation_id: str = Field(max_length=64)
     role: str = Field(index=True, max_length=16)  # "user" | "assistant" | "system"
     content: str = Field(default="")
 
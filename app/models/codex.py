@@ -3,6 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 from app.models.common import utcnow
@@ -22,6 +23,13 @@ class Tagging(SQLModel, table=True):
     - entity_id: the table PK
     """
 
+    # Composite indexes for the (entity_type, entity_id) and (entity_type, tag_id) lookups in app.crud.tags;
+    # tag_id on the first makes it covering for the has_tag EXISTS probe
+    __table_args__ = (
+        Index("ix_tagging_entity_tag", "entity_type", "entity_id", "tag_id"),
+        Index("ix_tagging_type_tag", "entity_type", "tag_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     tag_id: int = Field(foreign_key="tag.id", index=True)
     entity_type: str = Field(index=True, max_length=32)
@@ -42,7 +50,7 @@ class Character(SQLModel, table=True):
     is_incomplete: bool = Field(default=False, index=True)
 
     created_at: datetime = Field(default_factory=utcnow)
-    updated_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow, index=True)
 
 
 class Concept(SQLModel, table=True):
@@ -55,7 +63,7 @@ class Concept(SQLModel, table=True):
     is_incomplete: bool = Field(default=False, index=True)
 
     created_at: datetime = Field(default_factory=utcnow)
-    updated_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow, index=True)
 
 
 class Act(SQLModel, table=True):
@@ -68,6 +76,6 @@ class Act(SQLModel, table=True):
     is_incomplete: bool = Field(default=False, index=True)
 
     created_at: datetime = Field(default_factory=utcnow)
-    updated_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow, index=True)
 
 
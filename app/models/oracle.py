@@ -28,3 +28,30 @@ class OracleThread(SQLModel, table=True):
 
     created_at: datetime = Field(default_factory=utcnow, index=True)
     updated_at: datetime = Field(default_factory=utcnow)
+
+
+class BibleEditorAssistant(SQLModel, table=True):
+    """
+    Tracks the OpenAI assistant used by the bible editor.
+    Its instructions hold the full bible context; we keep a single row and
+    update it in place when the bible changes.
+    """
+    id: int | None = Field(default=None, primary_key=True)
+    assistant_id: str = Field(unique=True, max_length=128)  # OpenAI assistant ID
+    instructions_hash: str = Field(max_length=64)  # Hash of preamble + bible context
+    model: str = Field(default="gpt-4o", max_length=32)
+
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
+
+
+class OracleAnswerCache(SQLModel, table=True):
+    """Recent first-turn oracle answers keyed by question embedding (semantic cache)."""
+    id: int | None = Field(default=None, primary_key=True)
+    instructions_hash: str = Field(index=True, max_length=64)  # Oracle instructions the answer was given under
+    lore_version: str = Field(default="", max_length=64)  # lore_version_token() of the story data it was built from
+    question: str = Field(default="")
+    embedding: bytes = Field(default=b"")  # float32 array of the unit-length question embedding
+    answer: str = Field(default="")
+
+    created_at: datetime = Field(default_factory=utcnow, index=True)
@@ -22,10 +22,11 @@ class PlotHole(SQLModel, table=True):
     status: str = Field(default="open", index=True, max_length=40)
     importance: int = Field(default=3, index=True, ge=1, le=5)
 
-    # AI output (Phase 4)
+    # AI output (Phase 4); the previous suggestions stay put while a new brainstorm runs
     ai_suggestions: str = Field(default="")
+    brainstorm_pending: bool = Field(default=False)
 
     created_at: datetime = Field(default_factory=utcnow)
-    updated_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow, index=True)
 
 
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlmodel import Field, SQLModel
+from sqlalchemy import literal_column
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlmodel import Field, SQLModel, func
 
 from app.models.common import utcnow
 
 
 class Event(SQLModel, table=True):
+    # Lets pydantic skip effective_order instead of rejecting it as an unannotated field
+    model_config = {"ignored_types": (hybrid_property,)}
+
     id: int | None = Field(default=None, primary_key=True)
     title: str = Field(index=True, max_length=240)
     description: str = Field(default="")
@@ -28,6 +33,15 @@ class Event(SQLModel, table=True):
     is_incomplete: bool = Field(default=False, index=True)
 
     created_at: datetime = Field(default_factory=utcnow)
-    updated_at: datetime = Field(default_factory=utcnow)
-
-
+    updated_at: datetime = Field(default_factory=utcnow, index=True)
+
+    @hybrid_property
+    def effective_order(self) -> int:
+        """Where the event sits on the timeline: the AI order if set (and non-zero), else approx_order."""
+        return self.ai_suggested_order or self.approx_order
+
+    @effective_order.inplace.expression
+    @classmethod
+    def _effective_order_expression(cls):
+        # Inline 0 (not a bound parameter) so SQLite can match ix_event_effective_order
+        return func.coalesce(func.nullif(cls.ai_suggested_order, literal_column("0")), cls.approx_order)
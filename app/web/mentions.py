@@ -5,14 +5,17 @@ import re
 from markupsafe import Markup, escape
 
 
-_MENTION_RE = re.compile(
-    r"""
-    @\{(?P<braced>[^}]{1,80})\}      # @{Multi Word}
-    |
-    @(?P<word>[A-Za-z][\w-]{0,50})   # @Jason
-    """,
-    re.VERBOSE,
+# group 1: @{Multi Word}, group 2: @Jason
+_MENTION_RE = re.compile(r"@\{([^}]{1,80})\}|@([A-Za-z][\w-]{0,50})")
+
+# Span shell around an escaped name: _SPAN_OPEN + name + _SPAN_MID + name + _SPAN_CLOSE.
+# data-mention is used by JS to fetch preview HTML.
+_SPAN_OPEN = (
+    '<span class="lk-mention underline decoration-dotted underline-offset-2 cursor-help text-indigo-200" '
+    'data-mention="'
 )
+_SPAN_MID = '">@'
+_SPAN_CLOSE = "</span>"
 
 
 def linkify_mentions(text: str | None) -> Markup:
@@ -27,31 +30,27 @@ def linkify_mentions(text: str | None) -> Markup:
         return Markup("")
 
     s = str(text)
+    # Most messages have no mentions: skip the scan entirely
+    if "@" not in s:
+        return escape(s)
+
+    # Fragments are joined once at the end; escape() results (Markup, a str
+    # subclass) go in as-is rather than being copied through str()
     out: list[str] = []
     last = 0
 
     for m in _MENTION_RE.finditer(s):
         start, end = m.span()
         if start > last:
-            out.append(str(escape(s[last:start])))
-
-        name = m.group("braced") or m.group("word") or ""
-        name = name.strip()
-        shown = "@" + name
-
-        # data-mention is used by JS to fetch preview HTML
-        out.append(
-            str(
-                Markup(
-                    '<span class="lk-mention underline decoration-dotted underline-offset-2 cursor-help text-indigo-200" '
-                    'data-mention="{name}">{shown}</span>'
-                ).format(name=escape(name), shown=escape(shown))
-            )
-        )
+            out.append(escape(s[last:start]))
+
+        braced, word = m.groups()
+        name_e = escape((braced or word or "").strip())
+        out.extend((_SPAN_OPEN, name_e, _SPAN_MID, name_e, _SPAN_CLOSE))
         last = end
 
     if last < len(s):
-        out.append(str(escape(s[last:])))
+        out.append(escape(s[last:]))
 
     return Markup("".join(out))
 
@@ -0,0 +1,30 @@
+"""Helpers shared by the web UI routers."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from fastapi import Request
+
+
+def _parse_int(value: str | None) -> int | None:
+    """Optional integer query param; blank or non-numeric input is None."""
+    if not value:
+        return None
+    value = value.strip()
+    # Checked up front rather than via int()'s ValueError: filters see free-typed text on every
+    # keystroke. isascii() keeps out digits like "²" that isdigit() accepts but int() rejects.
+    digits = value[1:] if value[:1] in ("+", "-") else value
+    return int(value) if digits.isascii() and digits.isdigit() else None
+
+
+def _row_etag(updated_at: datetime, variant: str = "") -> str:
+    """
+    Weak ETag for a row partial; every route that changes a row (tags included) bumps updated_at.
+    variant covers render state that changes without a write.
+    """
+    return f'W/"{updated_at.isoformat()}{variant}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    return request.headers.get("if-none-match") == etag
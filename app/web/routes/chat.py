@@ -1,17 +1,20 @@
 from __future__ import annotations
 
-import uuid
-from pathlib import Path
-
-from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
-
-from app.ai.entity_extractor import extract_entities_from_text
-from app.ai.oracle import answer_story_question, build_rag_lite_context
-from app.core.config import get_settings
-from app.core.db import get_session
+import logging
+import secrets
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from sqlalchemy.orm import load_only, raiseload
+from sqlmodel import Session, delete, select
+
+from app.ai.entity_extractor import aextract_entities_from_text
+from app.ai.keywords import KeywordMatcher
+from app.ai.oracle import aanswer_story_question, build_rag_lite_context
+from app.core.db import begin_read_snapshot, get_readonly_session, get_session, readonly_session, session_scope
 from app.crud.auto_entities import persist_extracted_entities
 from app.crud.oracle import cleanup_old_assistants
 from app.crud.settings import get_oracle_instructions, set_oracle_instructions
@@ -21,23 +24,53 @@ from app.models.codex import Act, Character, Concept
 from app.models.common import utcnow
 from app.models.problems import PlotHole
 from app.models.timeline import Event
-from app.web.mentions import linkify_mentions
+from app.web.templating import templates
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
-templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[1] / "templates"))
-settings = get_settings()
+_chat_thread_tmpl = templates.get_template("partials/chat_thread.html")
+logger = logging.getLogger(__name__)
 
 
-def _base_ctx(request: Request) -> dict:
-    return {"request": request, "db_path": str(settings.sqlite_path)}
+_CID_COOKIE = "lk_conversation_id"
 
 
 def _get_conversation_id(request: Request) -> str:
-    cid = request.cookies.get("lk_conversation_id")
+    cid = request.cookies.get(_CID_COOKIE)
     if cid:
         return cid
-    return uuid.uuid4().hex
+    # Same 32-hex-char shape as the uuid4().hex ids already stored in cookies
+    return secrets.token_hex(16)
+
+
+# Question openers; the wh-words match as prefixes, the rest need a following space
+_QUESTION_STARTERS = (
+    "who",
+    "what",
+    "when",
+    "where",
+    "why",
+    "how",
+    "can ",
+    "could ",
+    "should ",
+    "does ",
+    "do ",
+    "did ",
+    "is ",
+    "are ",
+    "will ",
+    "would ",
+)
+_QUESTION_HEAD_LEN = max(map(len, _QUESTION_STARTERS))
+
+_CREATION_KEYWORDS = KeywordMatcher(
+    [
+        "create a", "create an", "add a", "add an", "new character", "new concept",
+        "new event", "new plot hole", "new issue", "new problem", "add character",
+        "add concept", "add event", "add plot hole", "add issue", "add problem",
+    ]
+)
 
 
 def _is_question(text: str) -> bool:
@@ -46,25 +79,8 @@ def _is_question(text: str) -> bool:
         return False
     if "?" in t:
         return True
-    starters = (
-        "who",
-        "what",
-        "when",
-        "where",
-        "why",
-        "how",
-        "can ",
-        "could ",
-        "should ",
-        "does ",
-        "do ",
-        "did ",
-        "is ",
-        "are ",
-        "will ",
-        "would ",
-    )
-    return t.lower().startswith(starters)
+    # Only the head can match a starter; don't lower-case the whole message
+    return t[:_QUESTION_HEAD_LEN].lower().startswith(_QUESTION_STARTERS)
 
 
 def _should_extract_entities(text: str) -> bool:
@@ -74,12 +90,7 @@ def _should_extract_entities(text: str) -> bool:
         return False
 
     # Always extract if user explicitly requests creation
-    creation_keywords = [
-        "create a", "create an", "add a", "add an", "new character", "new concept",
-        "new event", "new plot hole", "new issue", "new problem", "add character",
-        "add concept", "add event", "add plot hole", "add issue", "add problem"
-    ]
-    if any(keyword in t for keyword in creation_keywords):
+    if _CREATION_KEYWORDS.any(t):
         return True
 
     # Don't extract entities from questions (unless they contain explicit creation commands)
@@ -90,136 +101,171 @@ def _should_extract_entities(text: str) -> bool:
     return True
 
 
-def _mention(name: str) -> str:
-    name = (name or "").strip()
-    return f"@{{{name}}}" if name else ""
+_SUMMARY_LABEL_KEYS = (
+    ("Character", "characters"),
+    ("Concept", "concepts"),
+    ("Event", "events"),
+    ("Plot Hole", "plot_holes"),
+)
+
+
+def _summary_block(title: str, block: dict) -> list[str]:
+    items = [
+        f"- {label}: @{{{name}}}"
+        for label, key in _SUMMARY_LABEL_KEYS
+        for name in (str(n).strip() for n in block.get(key) or ())
+        if name
+    ]
+    return [title, *items] if items else []
 
 
 def _format_entity_summary(summary: dict) -> str:
     created = (summary or {}).get("created") or {}
     updated = (summary or {}).get("updated") or {}
 
-    lines: list[str] = []
-
-    def add_block(title: str, block: dict) -> None:
-        items: list[str] = []
-        for label, key in [
-            ("Character", "characters"),
-            ("Concept", "concepts"),
-            ("Event", "events"),
-            ("Plot Hole", "plot_holes"),
-        ]:
-            for name in block.get(key) or []:
-                m = _mention(str(name))
-                if m:
-                    items.append(f"- {label}: {m}")
-        if items:
-            lines.append(title)
-            lines.extend(items)
-
-    add_block("Created from your message:", created)
-    add_block("Matched existing (may be unchanged):", updated)
+    lines = _summary_block("Created from your message:", created) + _summary_block(
+        "Matched existing (may be unchanged):", updated
+    )
     return "\n".join(lines).strip()
 
 
-def _generate_novel_summary(session: Session) -> str:
-    """Generate a comprehensive novel summary from all stored data."""
-    lines = []
-
-    # Header
-    lines.append("=" * 80)
-    lines.append("LOREKEEPER NOVEL SUMMARY")
-    lines.append("=" * 80)
-    lines.append("")
-
-    # Bible Sections
-    bible_sections = session.exec(select(BibleSection).order_by(BibleSection.order)).all()
-    if bible_sections:
-        lines.append("📖 BIBLE / WORLD BUILDING")
-        lines.append("-" * 40)
-        for section in bible_sections:
-            lines.append(f"## {section.display_name}")
-            if section.content.strip():
-                lines.append(section.content.strip())
-            lines.append("")
-        lines.append("")
-
-    # Characters
-    characters = session.exec(select(Character).order_by(Character.name)).all()
-    if characters:
-        lines.append("👥 CHARACTERS")
-        lines.append("-" * 40)
-        for char in characters:
-            lines.append(f"## {char.name}")
-            if char.traits.strip():
-                lines.append(f"Traits: {char.traits}")
-            if char.arc.strip():
-                lines.append(f"Arc: {char.arc}")
-            lines.append(f"Status: {char.status} | Importance: {char.importance}/5" + (" | Incomplete" if char.is_incomplete else ""))
-            lines.append("")
-
-    # Concepts
-    concepts = session.exec(select(Concept).order_by(Concept.title)).all()
-    if concepts:
-        lines.append("💡 CONCEPTS")
-        lines.append("-" * 40)
-        for concept in concepts:
-            lines.append(f"## {concept.title}")
-            if concept.description.strip():
-                lines.append(concept.description.strip())
-            lines.append(f"Status: {concept.status} | Importance: {concept.importance}/5" + (" | Incomplete" if concept.is_incomplete else ""))
-            lines.append("")
-
-    # Acts
-    acts = session.exec(select(Act).order_by(Act.title)).all()
-    if acts:
-        lines.append("🎭 ACTS")
-        lines.append("-" * 40)
-        for act in acts:
-            lines.append(f"## {act.title}")
-            if act.summary.strip():
-                lines.append(act.summary.strip())
-            lines.append(f"Status: {act.status} | Importance: {act.importance}/5" + (" | Incomplete" if act.is_incomplete else ""))
-            lines.append("")
-
-    # Timeline Events
-    events = session.exec(select(Event).order_by(Event.approx_order)).all()
-    if events:
-        lines.append("⏰ TIMELINE EVENTS")
-        lines.append("-" * 40)
-        for event in events:
-            lines.append(f"## {event.title}")
-            if event.act:
-                lines.append(f"Act: {event.act}")
-            if event.beat:
-                lines.append(f"Beat: {event.beat}")
-            if event.description.strip():
-                lines.append(event.description.strip())
-            if event.ai_notes.strip():
-                lines.append(f"AI Notes: {event.ai_notes}")
-            lines.append(f"Status: {event.status} | Importance: {event.importance}/5" + (" | Incomplete" if event.is_incomplete else ""))
-            lines.append("")
-
-    # Plot Holes
-    plot_holes = session.exec(select(PlotHole).order_by(PlotHole.title)).all()
-    if plot_holes:
-        lines.append("⚠️ PLOT HOLES & ISSUES")
-        lines.append("-" * 40)
-        for hole in plot_holes:
-            lines.append(f"## {hole.title}")
-            if hole.description.strip():
-                lines.append(hole.description.strip())
-            if hole.ai_suggestions.strip():
-                lines.append(f"AI Suggestions: {hole.ai_suggestions}")
-            lines.append(f"Kind: {hole.kind} | Status: {hole.status} | Importance: {hole.importance}/5")
-            lines.append("")
-
-    # Footer
-    lines.append("=" * 80)
-    lines.append(f"Generated on {utcnow().strftime('%Y-%m-%d %H:%M:%S')}")
-    lines.append("=" * 80)
-
-    return "\n".join(lines)
+_RULE = "=" * 80
+_SUMMARY_HEADER = f"{_RULE}\nLOREKEEPER NOVEL SUMMARY\n{_RULE}\n\n"
+_SUMMARY_FOOTER = f"{_RULE}\nGenerated on {{generated}}\n{_RULE}"
+_SECTION_TMPL = "{title}\n" + "-" * 40 + "\n"
+_STATUS_TMPL = "Status: {status} | Importance: {importance}/5{incomplete}\n\n"
+_HOLE_STATUS_TMPL = "Kind: {kind} | Status: {status} | Importance: {importance}/5\n\n"
+
+
+def _status_line(status: str, importance: int, is_incomplete: bool) -> str:
+    return _STATUS_TMPL.format(status=status, importance=importance, incomplete=" | Incomplete" if is_incomplete else "")
+
+
+def _bible_entry(display_name: str, content: str) -> str:
+    content = content.strip()
+    return f"## {display_name}\n" + (f"{content}\n" if content else "") + "\n"
+
+
+def _character_entry(name: str, traits: str, arc: str, status: str, importance: int, is_incomplete: bool) -> str:
+    return (
+        f"## {name}\n"
+        + (f"Traits: {traits}\n" if traits.strip() else "")
+        + (f"Arc: {arc}\n" if arc.strip() else "")
+        + _status_line(status, importance, is_incomplete)
+    )
+
+
+def _described_entry(title: str, text: str, status: str, importance: int, is_incomplete: bool) -> str:
+    text = text.strip()
+    return f"## {title}\n" + (f"{text}\n" if text else "") + _status_line(status, importance, is_incomplete)
+
+
+def _event_entry(
+    title: str,
+    act: str | None,
+    beat: str | None,
+    description: str,
+    ai_notes: str,
+    status: str,
+    importance: int,
+    is_incomplete: bool,
+) -> str:
+    description = description.strip()
+    return (
+        f"## {title}\n"
+        + (f"Act: {act}\n" if act else "")
+        + (f"Beat: {beat}\n" if beat else "")
+        + (f"{description}\n" if description else "")
+        + (f"AI Notes: {ai_notes}\n" if ai_notes.strip() else "")
+        + _status_line(status, importance, is_incomplete)
+    )
+
+
+def _plot_hole_entry(title: str, description: str, ai_suggestions: str, kind: str, status: str, importance: int) -> str:
+    description = description.strip()
+    return (
+        f"## {title}\n"
+        + (f"{description}\n" if description else "")
+        + (f"AI Suggestions: {ai_suggestions}\n" if ai_suggestions.strip() else "")
+        + _HOLE_STATUS_TMPL.format(kind=kind, status=status, importance=importance)
+    )
+
+
+# (heading, projected columns, order, entry formatter, text after the last entry)
+_SUMMARY_SECTIONS: tuple[tuple[str, tuple[Any, ...], Any, Callable[..., str], str], ...] = (
+    ("📖 BIBLE / WORLD BUILDING", (BibleSection.display_name, BibleSection.content), BibleSection.order, _bible_entry, "\n"),
+    (
+        "👥 CHARACTERS",
+        (Character.name, Character.traits, Character.arc, Character.status, Character.importance, Character.is_incomplete),
+        Character.name,
+        _character_entry,
+        "",
+    ),
+    (
+        "💡 CONCEPTS",
+        (Concept.title, Concept.description, Concept.status, Concept.importance, Concept.is_incomplete),
+        Concept.title,
+        _described_entry,
+        "",
+    ),
+    ("🎭 ACTS", (Act.title, Act.summary, Act.status, Act.importance, Act.is_incomplete), Act.title, _described_entry, ""),
+    (
+        "⏰ TIMELINE EVENTS",
+        (
+            Event.title,
+            Event.act,
+            Event.beat,
+            Event.description,
+            Event.ai_notes,
+            Event.status,
+            Event.importance,
+            Event.is_incomplete,
+        ),
+        Event.approx_order,
+        _event_entry,
+        "",
+    ),
+    (
+        "⚠️ PLOT HOLES & ISSUES",
+        (PlotHole.title, PlotHole.description, PlotHole.ai_suggestions, PlotHole.kind, PlotHole.status, PlotHole.importance),
+        PlotHole.title,
+        _plot_hole_entry,
+        "",
+    ),
+)
+
+
+def _iter_novel_summary(session: Session) -> Iterator[str]:
+    """Yield a comprehensive novel summary from all stored data, one entry at a time."""
+    # The section queries below read one consistent snapshot under one lock
+    begin_read_snapshot(session)
+
+    yield _SUMMARY_HEADER
+
+    for heading, columns, order_by, entry, trailer in _SUMMARY_SECTIONS:
+        # Rows are streamed in batches rather than buffered with .all()
+        rows = session.exec(select(*columns).order_by(order_by).execution_options(yield_per=500))
+        any_rows = False
+        for row in rows:
+            if not any_rows:
+                any_rows = True
+                yield _SECTION_TMPL.format(title=heading)
+            yield entry(*row)
+        if any_rows and trailer:
+            yield trailer
+
+    yield _SUMMARY_FOOTER.format(generated=utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def _thread_messages(session: Session, cid: str) -> list[ChatMessage]:
+    # The thread templates only render role and content; any other attribute
+    # access (or a future relationship) raises instead of lazy-loading per row.
+    return session.exec(
+        select(ChatMessage)
+        .options(load_only(ChatMessage.role, ChatMessage.content, raiseload=True), raiseload("*"))
+        .where(ChatMessage.conversation_id == cid)
+        .order_by(ChatMessage.created_at)
+    ).all()
 
 
 @router.get("", response_class=HTMLResponse)
@@ -230,114 +276,145 @@ def chat_root():
 @router.get("/oracle", response_class=HTMLResponse)
 def oracle_page(
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     cid = _get_conversation_id(request)
-    msgs = session.exec(
-        select(ChatMessage).where(ChatMessage.conversation_id == cid).order_by(ChatMessage.created_at)
-    ).all()
+    msgs = _thread_messages(session, cid)
 
     resp = templates.TemplateResponse(
         "chat_oracle.html",
-        {**_base_ctx(request), "title": "Story Oracle", "conversation_id": cid, "messages": msgs, "linkify_mentions": linkify_mentions},
+        {"request": request, "title": "Story Oracle", "conversation_id": cid, "messages": msgs},
     )
-    if not request.cookies.get("lk_conversation_id"):
-        resp.set_cookie("lk_conversation_id", cid, httponly=True, samesite="lax")
+    if not request.cookies.get(_CID_COOKIE):
+        resp.set_cookie(_CID_COOKIE, cid, httponly=True, samesite="lax")
     return resp
 
 
 @router.get("/thread", response_class=HTMLResponse)
 def oracle_thread(
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     cid = _get_conversation_id(request)
-    msgs = session.exec(
-        select(ChatMessage).where(ChatMessage.conversation_id == cid).order_by(ChatMessage.created_at)
-    ).all()
-    return templates.TemplateResponse(
-        "partials/chat_thread.html",
-        {**_base_ctx(request), "conversation_id": cid, "messages": msgs, "linkify_mentions": linkify_mentions},
+    msgs = _thread_messages(session, cid)
+    # HTMX refreshes this partial after every message, so render it directly
+    html = _chat_thread_tmpl.render(
+        request=request, conversation_id=cid, messages=msgs
     )
+    return HTMLResponse(html)
 
 
 @router.get("/bible", response_class=HTMLResponse)
 def oracle_bible_panel(
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     text = get_oracle_instructions(session)
     return templates.TemplateResponse(
         "partials/oracle_bible.html",
-        {**_base_ctx(request), "oracle_instructions": text, "saved": False, "open": False},
+        {"request": request, "oracle_instructions": text, "saved": False, "open": False},
     )
 
 
+# Background tasks run after the request session is closed, so each opens its own.
+def _cleanup_assistants_in_background() -> None:
+    with session_scope() as session:
+        try:
+            cleanup_old_assistants(session)
+        except Exception:
+            logger.exception("Oracle assistant cleanup failed")
+
+
+async def _extract_entities_in_background(text: str) -> None:
+    with session_scope() as session:
+        try:
+            extracted = await aextract_entities_from_text(session, text=text)
+            await run_in_threadpool(persist_extracted_entities, session, extracted)
+        except Exception:
+            logger.exception("Background entity extraction failed")
+
+
 @router.post("/bible", response_class=HTMLResponse)
 def oracle_bible_save(
     request: Request,
+    background_tasks: BackgroundTasks,
     oracle_instructions: str = Form(""),
     session: Session = Depends(get_session),
 ):
     set_oracle_instructions(session, oracle_instructions)
-    # Clean up old assistants to avoid accumulating too many
-    cleanup_old_assistants(session)
+    # Clean up old assistants to avoid accumulating too many (OpenAI deletes
+    # run after the response is sent)
+    background_tasks.add_task(_cleanup_assistants_in_background)
     text = get_oracle_instructions(session)
     return templates.TemplateResponse(
         "partials/oracle_bible.html",
-        {**_base_ctx(request), "oracle_instructions": text, "saved": True, "open": True},
+        {"request": request, "oracle_instructions": text, "saved": True, "open": True},
     )
 
 
 @router.post("/ask", response_class=HTMLResponse)
-def oracle_ask(
+async def oracle_ask(
     request: Request,
+    background_tasks: BackgroundTasks,
     message: str = Form(...),
     session: Session = Depends(get_session),
 ):
+    # The session is sync: every DB step below goes through run_in_threadpool, so
+    # a busy SQLite writer (30s timeout) stalls this request, not the event loop.
     cid = _get_conversation_id(request)
     text = message.strip()
     if not text:
-        return oracle_thread(request, session=session)
-
-    session.add(ChatMessage(conversation_id=cid, role="user", content=text))
-    session.commit()
-
-    # Check if this message should trigger entity extraction
-    should_extract_entities = _should_extract_entities(text)
-
-    # 1) Extract + persist entities only when appropriate
-    summary_text = ""
-    if should_extract_entities:
-        try:
-            extracted = extract_entities_from_text(session, text=text)
-            summary = persist_extracted_entities(session, extracted)
-            summary_text = _format_entity_summary(summary)
-        except Exception:
-            # Keep chat robust even if extraction fails
-            summary_text = ""
-
-    # 2) Respond: if it's a question, use the Oracle; otherwise confirm creation.
-    if _is_question(text):
-        context = build_rag_lite_context(session, question=text)
-        try:
-            answer = answer_story_question(
-                session=session,
-                conversation_id=cid,
-                question=text,
-                context=context
-            )
-        except Exception as ex:
-            answer = f"(AI error: {type(ex).__name__})"
-    else:
-        answer = "Got it — I added that to your database. Ask me a question about it anytime."
-
-    final = (summary_text + "\n\n" + answer).strip() if summary_text else (answer or "").strip()
-
-    session.add(ChatMessage(conversation_id=cid, role="assistant", content=final))
-    session.commit()
-
-    return oracle_thread(request, session=session)
+        return await run_in_threadpool(oracle_thread, request, session=session)
+
+    # Both turns are written in one commit after the reply. The user row is only
+    # added then: a pending INSERT would otherwise be flushed by the first query
+    # and hold SQLite's write lock through the LLM calls. It is timestamped now,
+    # and it is still saved if building the reply fails.
+    user_msg = ChatMessage(conversation_id=cid, role="user", content=text)
+    reply: ChatMessage | None = None
+    try:
+        is_question = _is_question(text)
+
+        # 1) Extract + persist entities only when appropriate. A question's reply
+        # is the Oracle's answer, so its extraction runs after the response;
+        # otherwise the entity summary is the reply and is built inline.
+        summary_text = ""
+        if _should_extract_entities(text):
+            if is_question:
+                background_tasks.add_task(_extract_entities_in_background, text)
+            else:
+                try:
+                    extracted = await aextract_entities_from_text(session, text=text)
+                    summary = await run_in_threadpool(persist_extracted_entities, session, extracted)
+                    summary_text = _format_entity_summary(summary)
+                except Exception:
+                    # Keep chat robust even if extraction fails
+                    summary_text = ""
+
+        # 2) Respond: if it's a question, use the Oracle; otherwise confirm creation.
+        if is_question:
+            context = await run_in_threadpool(build_rag_lite_context, session, question=text)
+            try:
+                answer = await aanswer_story_question(
+                    session=session,
+                    conversation_id=cid,
+                    question=text,
+                    context=context
+                )
+            except Exception as ex:
+                answer = f"(AI error: {type(ex).__name__})"
+        else:
+            answer = "Got it — I added that to your database. Ask me a question about it anytime."
+
+        final = (summary_text + "\n\n" + answer).strip() if summary_text else (answer or "").strip()
+        reply = ChatMessage(conversation_id=cid, role="assistant", content=final)
+    finally:
+        session.add(user_msg)
+        if reply is not None:
+            session.add(reply)
+        await run_in_threadpool(session.commit)
+
+    return await run_in_threadpool(oracle_thread, request, session=session)
 
 
 @router.post("/clear", response_class=HTMLResponse)
@@ -346,24 +423,24 @@ def oracle_clear(
     session: Session = Depends(get_session),
 ):
     cid = _get_conversation_id(request)
-    msgs = session.exec(select(ChatMessage).where(ChatMessage.conversation_id == cid)).all()
-    for m in msgs:
-        session.delete(m)
+    session.exec(delete(ChatMessage).where(ChatMessage.conversation_id == cid))
     session.commit()
     return oracle_thread(request, session=session)
 
 
 @router.get("/export")
-def export_novel_summary(session: Session = Depends(get_session)):
-    """Export all story data as a comprehensive novel summary."""
-    summary_text = _generate_novel_summary(session)
-
-    return Response(
-        content=summary_text,
+def export_novel_summary():
+    """Export all story data as a comprehensive novel summary (streamed)."""
+    # The response body is produced after the handler returns, so the generator
+    # owns its session instead of using a request-scoped dependency.
+    def body() -> Iterator[str]:
+        with readonly_session() as session:
+            yield from _iter_novel_summary(session)
+
+    return StreamingResponse(
+        body(),
         media_type="text/plain",
         headers={
             "Content-Disposition": "attachment; filename=novel_summary.txt"
         }
     )
-
-
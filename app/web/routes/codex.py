@@ -1,43 +1,26 @@
 from __future__ import annotations
 
-from pathlib import Path
-
 from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from sqlmodel import Session, select
 
-from app.core.config import get_settings
-from app.core.db import get_session
+from app.core.db import get_readonly_session, get_session
+from app.crud.search import fts_rowids, fts_substring_query
 from app.crud.tags import (
-    filter_entity_ids_by_tag,
+    clear_entity_tags,
     get_entity_tag_names,
+    get_entity_tag_names_bulk,
+    has_tag,
     parse_tag_names,
     set_entity_tags,
 )
 from app.models.codex import Act, Character, Concept
 from app.models.common import utcnow
-from app.web.mentions import linkify_mentions
+from app.web.routes._common import _not_modified, _parse_int, _row_etag
+from app.web.templating import templates
 
 
 router = APIRouter(prefix="/codex", tags=["codex"])
-templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[1] / "templates"))
-settings = get_settings()
-
-def _parse_int(value: str | None) -> int | None:
-    if value is None:
-        return None
-    value = value.strip()
-    if value == "":
-        return None
-    try:
-        return int(value)
-    except ValueError:
-        return None
-
-
-def _base_ctx(request: Request) -> dict:
-    return {"request": request, "db_path": str(settings.sqlite_path)}
 
 
 @router.get("/characters", response_class=HTMLResponse)
@@ -45,7 +28,7 @@ def characters_page(request: Request):
     return templates.TemplateResponse(
         "codex_characters.html",
         {
-            **_base_ctx(request),
+            "request": request,
             "title": "Characters",
         },
     )
@@ -58,7 +41,7 @@ def characters_list(
     importance: str | None = None,
     tag: str | None = None,
     q: str | None = None,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     stmt = select(Character)
     if status:
@@ -67,24 +50,20 @@ def characters_list(
     if importance_i is not None:
         stmt = stmt.where(Character.importance == importance_i)
     if q:
-        like = f"%{q}%"
-        stmt = stmt.where(Character.name.like(like) | Character.traits.like(like) | Character.arc.like(like))
+        match = fts_substring_query(q, ("name", "traits", "arc"))
+        if match is not None:
+            stmt = stmt.where(Character.id.in_(fts_rowids("character", match, mirror="trgm")))
+        else:
+            like = f"%{q}%"
+            stmt = stmt.where(Character.name.like(like) | Character.traits.like(like) | Character.arc.like(like))
     if tag:
-        ids = filter_entity_ids_by_tag(session, entity_type="character", tag_name=tag)
-        if not ids:
-            characters: list[Character] = []
-            tags_by_id: dict[int, list[str]] = {}
-            return templates.TemplateResponse(
-                "partials/character_table.html",
-                {**_base_ctx(request), "characters": characters, "tags_by_id": tags_by_id},
-            )
-        stmt = stmt.where(Character.id.in_(ids))
+        stmt = stmt.where(has_tag(entity_type="character", entity_id=Character.id, tag_name=tag))
 
     characters = session.exec(stmt.order_by(Character.name)).all()
-    tags_by_id = {c.id: get_entity_tag_names(session, entity_type="character", entity_id=c.id) for c in characters if c.id}
+    tags_by_id = get_entity_tag_names_bulk(session, entity_type="character", entity_ids=[c.id for c in characters if c.id])
     return templates.TemplateResponse(
         "partials/character_table.html",
-        {**_base_ctx(request), "characters": characters, "tags_by_id": tags_by_id, "linkify_mentions": linkify_mentions},
+        {"request": request, "characters": characters, "tags_by_id": tags_by_id},
     )
 
 
@@ -101,9 +80,9 @@ def characters_create(
 ):
     c = Character(name=name, traits=traits, arc=arc, status=status, importance=importance)
     session.add(c)
+    session.flush()  # assigns c.id; row and tags go in one commit
+    set_entity_tags(session, entity_type="character", entity_id=c.id, tag_names=parse_tag_names(tags), commit=False)
     session.commit()
-    session.refresh(c)
-    set_entity_tags(session, entity_type="character", entity_id=c.id, tag_names=parse_tag_names(tags))
     # Return the refreshed list (HTMX)
     return characters_list(request, session=session)
 
@@ -112,23 +91,28 @@ def characters_create(
 def characters_row(
     character_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     c = session.get(Character, character_id)
     if not c:
         return HTMLResponse("Not found", status_code=404)
+    etag = _row_etag(c.updated_at)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     tags = get_entity_tag_names(session, entity_type="character", entity_id=c.id) if c.id else []
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "partials/character_row.html",
-        {**_base_ctx(request), "c": c, "tags": tags, "linkify_mentions": linkify_mentions},
+        {"request": request, "c": c, "tags": tags},
     )
+    response.headers["ETag"] = etag
+    return response
 
 
 @router.get("/characters/{character_id}/edit", response_class=HTMLResponse)
 def characters_edit_row(
     character_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     c = session.get(Character, character_id)
     if not c:
@@ -136,7 +120,7 @@ def characters_edit_row(
     tags = get_entity_tag_names(session, entity_type="character", entity_id=c.id) if c.id else []
     return templates.TemplateResponse(
         "partials/character_row_edit.html",
-        {**_base_ctx(request), "c": c, "tags_csv": ", ".join(tags), "linkify_mentions": linkify_mentions},
+        {"request": request, "c": c, "tags_csv": ", ".join(tags)},
     )
 
 
@@ -162,9 +146,9 @@ def characters_update(
     c.importance = importance
     c.updated_at = utcnow()
     session.add(c)
-    session.commit()
     if c.id:
-        set_entity_tags(session, entity_type="character", entity_id=c.id, tag_names=parse_tag_names(tags))
+        set_entity_tags(session, entity_type="character", entity_id=c.id, tag_names=parse_tag_names(tags), commit=False)
+    session.commit()
     return characters_row(character_id=character_id, request=request, session=session)
 
 
@@ -181,7 +165,7 @@ def characters_toggle_incomplete(
     c.updated_at = utcnow()
     session.add(c)
     session.commit()
-    return characters_list(request, session=session)
+    return characters_row(character_id=character_id, request=request, session=session)
 
 
 @router.post("/characters/{character_id}/delete", response_class=HTMLResponse)
@@ -193,14 +177,16 @@ def characters_delete(
     c = session.get(Character, character_id)
     if not c:
         return HTMLResponse("Not found", status_code=404)
+    clear_entity_tags(session, entity_type="character", entity_id=character_id)
     session.delete(c)
     session.commit()
-    return characters_list(request, session=session)
+    # Empty body: the row's outerHTML swap removes it
+    return HTMLResponse("")
 
 
 @router.get("/concepts", response_class=HTMLResponse)
 def concepts_page(request: Request):
-    return templates.TemplateResponse("codex_concepts.html", {**_base_ctx(request), "title": "Concepts"})
+    return templates.TemplateResponse("codex_concepts.html", {"request": request, "title": "Concepts"})
 
 
 @router.get("/concepts/list", response_class=HTMLResponse)
@@ -210,7 +196,7 @@ def concepts_list(
     importance: str | None = None,
     tag: str | None = None,
     q: str | None = None,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     stmt = select(Concept)
     if status:
@@ -219,24 +205,20 @@ def concepts_list(
     if importance_i is not None:
         stmt = stmt.where(Concept.importance == importance_i)
     if q:
-        like = f"%{q}%"
-        stmt = stmt.where(Concept.title.like(like) | Concept.description.like(like))
+        match = fts_substring_query(q, ("title", "description"))
+        if match is not None:
+            stmt = stmt.where(Concept.id.in_(fts_rowids("concept", match, mirror="trgm")))
+        else:
+            like = f"%{q}%"
+            stmt = stmt.where(Concept.title.like(like) | Concept.description.like(like))
     if tag:
-        ids = filter_entity_ids_by_tag(session, entity_type="concept", tag_name=tag)
-        if not ids:
-            concepts: list[Concept] = []
-            tags_by_id: dict[int, list[str]] = {}
-            return templates.TemplateResponse(
-                "partials/concept_table.html",
-                {**_base_ctx(request), "concepts": concepts, "tags_by_id": tags_by_id},
-            )
-        stmt = stmt.where(Concept.id.in_(ids))
+        stmt = stmt.where(has_tag(entity_type="concept", entity_id=Concept.id, tag_name=tag))
 
     concepts = session.exec(stmt.order_by(Concept.title)).all()
-    tags_by_id = {c.id: get_entity_tag_names(session, entity_type="concept", entity_id=c.id) for c in concepts if c.id}
+    tags_by_id = get_entity_tag_names_bulk(session, entity_type="concept", entity_ids=[c.id for c in concepts if c.id])
     return templates.TemplateResponse(
         "partials/concept_table.html",
-        {**_base_ctx(request), "concepts": concepts, "tags_by_id": tags_by_id, "linkify_mentions": linkify_mentions},
+        {"request": request, "concepts": concepts, "tags_by_id": tags_by_id},
     )
 
 
@@ -252,9 +234,9 @@ def concepts_create(
 ):
     c = Concept(title=title, description=description, status=status, importance=importance)
     session.add(c)
+    session.flush()
+    set_entity_tags(session, entity_type="concept", entity_id=c.id, tag_names=parse_tag_names(tags), commit=False)
     session.commit()
-    session.refresh(c)
-    set_entity_tags(session, entity_type="concept", entity_id=c.id, tag_names=parse_tag_names(tags))
     return concepts_list(request, session=session)
 
 
@@ -262,23 +244,28 @@ def concepts_create(
 def concepts_row(
     concept_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     c = session.get(Concept, concept_id)
     if not c:
         return HTMLResponse("Not found", status_code=404)
+    etag = _row_etag(c.updated_at)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     tags = get_entity_tag_names(session, entity_type="concept", entity_id=c.id) if c.id else []
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "partials/concept_row.html",
-        {**_base_ctx(request), "c": c, "tags": tags, "linkify_mentions": linkify_mentions},
+        {"request": request, "c": c, "tags": tags},
     )
+    response.headers["ETag"] = etag
+    return response
 
 
 @router.get("/concepts/{concept_id}/edit", response_class=HTMLResponse)
 def concepts_edit_row(
     concept_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     c = session.get(Concept, concept_id)
     if not c:
@@ -286,7 +273,7 @@ def concepts_edit_row(
     tags = get_entity_tag_names(session, entity_type="concept", entity_id=c.id) if c.id else []
     return templates.TemplateResponse(
         "partials/concept_row_edit.html",
-        {**_base_ctx(request), "c": c, "tags_csv": ", ".join(tags), "linkify_mentions": linkify_mentions},
+        {"request": request, "c": c, "tags_csv": ", ".join(tags)},
     )
 
 
@@ -310,9 +297,9 @@ def concepts_update(
     c.importance = importance
     c.updated_at = utcnow()
     session.add(c)
-    session.commit()
     if c.id:
-        set_entity_tags(session, entity_type="concept", entity_id=c.id, tag_names=parse_tag_names(tags))
+        set_entity_tags(session, entity_type="concept", entity_id=c.id, tag_names=parse_tag_names(tags), commit=False)
+    session.commit()
     return concepts_row(concept_id=concept_id, request=request, session=session)
 
 
@@ -329,7 +316,7 @@ def concepts_toggle_incomplete(
     c.updated_at = utcnow()
     session.add(c)
     session.commit()
-    return concepts_list(request, session=session)
+    return concepts_row(concept_id=concept_id, request=request, session=session)
 
 
 @router.post("/concepts/{concept_id}/delete", response_class=HTMLResponse)
@@ -341,15 +328,16 @@ def concepts_delete(
     c = session.get(Concept, concept_id)
     if not c:
         return HTMLResponse("Not found", status_code=404)
+    clear_entity_tags(session, entity_type="concept", entity_id=concept_id)
     session.delete(c)
     session.commit()
-    return concepts_list(request, session=session)
+    return HTMLResponse("")
 
 
 @router.get("/acts", response_class=HTMLResponse)
 def acts_page(request: Request):
     # Acts are now applied as classifications on Timeline events.
-    return templates.TemplateResponse("codex_acts.html", {**_base_ctx(request), "title": "Acts"})
+    return templates.TemplateResponse("codex_acts.html", {"request": request, "title": "Acts"})
 
 
 ## Act CRUD removed: acts are now applied on Timeline Events via act/beat fields.
@@ -1,31 +1,66 @@
-import os
-import requests
+import socket
+import time
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from functools import lru_cache
 from pathlib import Path
 
+from app.core.config import get_settings
+from app.web.templating import templates
+
 router = APIRouter()
-templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
+settings = get_settings()
 
+_VITE_PORTS = (5137, 5138, 5139, 5140, 5173)  # Common vite ports
+_VITE_PROBE_TTL = 30  # seconds between re-probes
 
-@router.get("/map", response_class=HTMLResponse)
-def map_page(request: Request):
-    # Check if Vite dev server is running (development mode)
-    vite_ports = [5137, 5138, 5139, 5140, 5173]  # Common vite ports
-    vite_dev_url = None
-    is_development = False
 
-    for port in vite_ports:
+@lru_cache(maxsize=1)
+def _probe_vite(_ttl_bucket: int) -> str | None:
+    for port in _VITE_PORTS:
         try:
-            # Quick check if vite dev server is responding
-            response = requests.get(f"http://localhost:{port}/", timeout=1)
-            if response.status_code == 200:
-                vite_dev_url = f"http://localhost:{port}"
-                is_development = True
-                break
-        except (requests.RequestException, requests.Timeout):
+            # A bare TCP connect is enough to see that the dev server is up
+            with socket.create_connection(("localhost", port), timeout=0.05):
+                return f"http://localhost:{port}"
+        except OSError:
             continue
+    return None
+
+
+def _vite_dev_url() -> str | None:
+    """URL of a running Vite dev server (debug mode only), re-probed every _VITE_PROBE_TTL seconds."""
+    if not settings.debug:
+        return None
+    return _probe_vite(int(time.time() // _VITE_PROBE_TTL))
+
+
+_MAP_ASSETS_DIR = Path(__file__).parent.parent.parent.parent / "map" / "dist" / "assets"
+
+
+def _newest(assets_dir: Path, pattern: str) -> str:
+    files = sorted(assets_dir.glob(pattern), key=lambda p: p.stat().st_mtime, reverse=True)
+    return f"/map-assets/assets/{files[0].name}" if files else ""
+
+
+@lru_cache(maxsize=1)
+def _scan_map_assets(_dir_mtime_ns: int) -> tuple[str, str]:
+    return _newest(_MAP_ASSETS_DIR, "index-*.js"), _newest(_MAP_ASSETS_DIR, "index-*.css")
+
+
+def _map_assets() -> tuple[str, str]:
+    """(js, css) URLs of the newest built bundle; rescanned only when the assets dir changes."""
+    try:
+        mtime_ns = _MAP_ASSETS_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        return "", ""
+    return _scan_map_assets(mtime_ns)
+
+
+@router.get("/map", response_class=HTMLResponse)
+def map_page(request: Request):
+    # Check if Vite dev server is running (development mode)
+    vite_dev_url = _vite_dev_url()
+    is_development = vite_dev_url is not None
 
     if is_development:
         # Use Vite dev server assets
@@ -33,18 +68,7 @@ def map_page(request: Request):
         map_css = ""  # Vite handles CSS injection automatically in dev mode
     else:
         # Use built assets from dist
-        map_dist_path = Path(__file__).parent.parent.parent.parent / "map" / "dist" / "assets"
-        map_js = ""
-        map_css = ""
-
-        if map_dist_path.exists():
-            files = sorted(list(map_dist_path.glob("index-*.js")), key=lambda p: p.stat().st_mtime, reverse=True)
-            if files:
-                map_js = f"/map-assets/assets/{files[0].name}"
-
-            files = sorted(list(map_dist_path.glob("index-*.css")), key=lambda p: p.stat().st_mtime, reverse=True)
-            if files:
-                map_css = f"/map-assets/assets/{files[0].name}"
+        map_js, map_css = _map_assets()
 
     return templates.TemplateResponse(
         "map.html",
@@ -1,44 +1,56 @@
 from __future__ import annotations
 
-from pathlib import Path
-
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
+from sqlalchemy import literal, union_all
+from sqlmodel import Session, func, select
 
-from app.core.config import get_settings
-from app.core.db import get_session
+from app.core.db import get_readonly_session
+from app.crud.search import fts_rowids, fts_substring_query
 from app.models.codex import Character, Concept
 from app.models.problems import PlotHole
 from app.models.timeline import Event
+from app.web.templating import templates
 
 
 router = APIRouter(prefix="/mentions", tags=["mentions"])
-templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[1] / "templates"))
-settings = get_settings()
 
 
-def _base_ctx(request: Request) -> dict:
-    return {"request": request, "db_path": str(settings.sqlite_path)}
+# Exact-match precedence: Character, then Event, Concept, PlotHole (simple + predictable)
+_EXACT_SOURCES = ((Character, Character.name), (Event, Event.title), (Concept, Concept.title), (PlotHole, PlotHole.title))
+
+
+def _exact_match(session: Session, q: str) -> Character | Event | Concept | PlotHole | None:
+    """
+    First exact (case-insensitive) title match across all kinds, in one
+    UNION ALL statement; each branch is a ix_<table>_<col>_lower lookup.
+    """
+    branches = [
+        select(literal(rank).label("rank"), model.id.label("id")).where(func.lower(col) == func.lower(q))
+        for rank, (model, col) in enumerate(_EXACT_SOURCES)
+    ]
+    row = session.exec(union_all(*branches).order_by("rank", "id").limit(1)).first()
+    if row is None:
+        return None
+    rank, entity_id = row
+    return session.get(_EXACT_SOURCES[rank][0], entity_id)
 
 
 @router.get("/preview", response_class=HTMLResponse)
 def preview(
     request: Request,
     name: str = Query(..., min_length=1, max_length=80),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     q = name.strip()
-    q_lower = q.lower()
 
-    # Prefer Character exact match, then Event, Concept, PlotHole (simple + predictable).
-    character = session.exec(select(Character).where(Character.name.ilike(q))).first()
-    if character:
+    match = _exact_match(session, q)
+    if isinstance(match, Character):
+        character = match
         return templates.TemplateResponse(
             "partials/mention_preview.html",
             {
-                **_base_ctx(request),
+                "request": request,
                 "kind": "Character",
                 "title": character.name,
                 "body": (character.traits or character.arc)[:240],
@@ -46,13 +58,13 @@ def preview(
             },
         )
 
-    event = session.exec(select(Event).where(Event.title.ilike(q))).first()
-    if event:
-        order = event.ai_suggested_order or event.approx_order
+    if isinstance(match, Event):
+        event = match
+        order = event.effective_order
         return templates.TemplateResponse(
             "partials/mention_preview.html",
             {
-                **_base_ctx(request),
+                "request": request,
                 "kind": "Event",
                 "title": event.title,
                 "body": (event.description or event.ai_notes)[:240],
@@ -60,12 +72,12 @@ def preview(
             },
         )
 
-    concept = session.exec(select(Concept).where(Concept.title.ilike(q))).first()
-    if concept:
+    if isinstance(match, Concept):
+        concept = match
         return templates.TemplateResponse(
             "partials/mention_preview.html",
             {
-                **_base_ctx(request),
+                "request": request,
                 "kind": "Concept",
                 "title": concept.title,
                 "body": (concept.description or "")[:240],
@@ -73,12 +85,12 @@ def preview(
             },
         )
 
-    hole = session.exec(select(PlotHole).where(PlotHole.title.ilike(q))).first()
-    if hole:
+    if isinstance(match, PlotHole):
+        hole = match
         return templates.TemplateResponse(
             "partials/mention_preview.html",
             {
-                **_base_ctx(request),
+                "request": request,
                 "kind": "Problem",
                 "title": hole.title,
                 "body": (hole.description or hole.ai_suggestions)[:240],
@@ -86,18 +98,22 @@ def preview(
             },
         )
 
-    # fallback: case-insensitive contains search, just in case user typed partial
-    like = f"%{q_lower}%"
-    character = session.exec(select(Character).where(Character.name.ilike(like))).first()
+    # fallback: case-insensitive contains search via the trigram index, just in case user typed partial
+    fts_match = fts_substring_query(q, ("name",))
+    if fts_match is not None:
+        partial = Character.id.in_(fts_rowids("character", fts_match, mirror="trgm"))
+    else:
+        partial = Character.name.ilike(f"%{q.lower()}%")
+    character = session.exec(select(Character).where(partial).order_by(Character.id)).first()
     if character:
         return templates.TemplateResponse(
             "partials/mention_preview.html",
-            {**_base_ctx(request), "kind": "Character", "title": character.name, "body": (character.traits or character.arc)[:240], "meta": "partial match"},
+            {"request": request, "kind": "Character", "title": character.name, "body": (character.traits or character.arc)[:240], "meta": "partial match"},
         )
 
     return templates.TemplateResponse(
         "partials/mention_preview.html",
-        {**_base_ctx(request), "kind": "Not found", "title": q, "body": "No matching item in your database.", "meta": "Tip: create it in Codex/Timeline first."},
+        {"request": request, "kind": "Not found", "title": q, "body": "No matching item in your database.", "meta": "Tip: create it in Codex/Timeline first."},
     )
 
 
@@ -1,34 +1,35 @@
 from __future__ import annotations
 
 import json
-from pathlib import Path
+from datetime import timedelta, timezone
 
-from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, Response
 from sqlmodel import Session, select
 
-from app.ai.plothole_engine import brainstorm_plot_hole_solutions
-from app.core.config import get_settings
-from app.core.db import get_session
+from app.ai.oracle import fetch_rag_rows
+from app.ai.plothole_engine import abrainstorm_plot_hole_solutions
+from app.core.db import get_readonly_session, get_session, session_scope
+from app.crud.search import fts_rowids, fts_substring_query
 from app.crud.tags import (
-    filter_entity_ids_by_tag,
+    clear_entity_tags,
     get_entity_tag_names,
+    get_entity_tag_names_bulk,
+    has_tag,
     parse_tag_names,
     set_entity_tags,
 )
-from app.models.codex import Act, Character, Concept
+from app.models.codex import Act, Character
 from app.models.common import utcnow
 from app.models.problems import PlotHole
-from app.models.timeline import Event
-from app.web.mentions import linkify_mentions
+from app.web.routes._common import _not_modified, _parse_int, _row_etag
+from app.web.templating import templates
 
 
 router = APIRouter(prefix="/problems", tags=["problems"])
-templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[1] / "templates"))
-settings = get_settings()
 
-PROBLEM_KINDS: list[tuple[str, str]] = [
+PROBLEM_KINDS: tuple[tuple[str, str], ...] = (
     ("plot_hole", "Plot Hole"),
     ("scene_to_fix", "Scene to Fix"),
     ("concept_issue", "Concept Issue"),
@@ -37,32 +38,30 @@ PROBLEM_KINDS: list[tuple[str, str]] = [
     ("character_motivation", "Character Motivation"),
     ("worldbuilding", "Worldbuilding"),
     ("other", "Other"),
-]
-
-def _parse_int(value: str | None) -> int | None:
-    if value is None:
-        return None
-    value = value.strip()
-    if value == "":
-        return None
-    try:
-        return int(value)
-    except ValueError:
-        return None
+)
+
+# A brainstorm still pending this long after it started (updated_at) is treated
+# as lost, e.g. to a restart, so its row stops polling
+BRAINSTORM_STALE_AFTER = timedelta(minutes=5)
 
 
-def _base_ctx(request: Request) -> dict:
-    return {"request": request, "db_path": str(settings.sqlite_path)}
+def _brainstorming(hole: PlotHole) -> bool:
+    """Whether the row should show (and poll on) an in-flight brainstorm."""
+    if not hole.brainstorm_pending:
+        return False
+    # SQLite hands datetimes back naive; they are stored in UTC
+    started = hole.updated_at if hole.updated_at.tzinfo else hole.updated_at.replace(tzinfo=timezone.utc)
+    return utcnow() - started < BRAINSTORM_STALE_AFTER
 
 
 @router.get("/holes", response_class=HTMLResponse)
-def holes_page(request: Request, session: Session = Depends(get_session)):
+def holes_page(request: Request, session: Session = Depends(get_readonly_session)):
     characters = session.exec(select(Character).order_by(Character.name)).all()
     acts = session.exec(select(Act).order_by(Act.title)).all()
     return templates.TemplateResponse(
         "problems_holes.html",
         {
-            **_base_ctx(request),
+            "request": request,
             "title": "Problems",
             "characters": characters,
             "acts": acts,
@@ -79,7 +78,7 @@ def holes_list(
     importance: str | None = None,
     tag: str | None = None,
     q: str | None = None,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     stmt = select(PlotHole)
     if kind:
@@ -90,24 +89,20 @@ def holes_list(
     if importance_i is not None:
         stmt = stmt.where(PlotHole.importance == importance_i)
     if q:
-        like = f"%{q}%"
-        stmt = stmt.where(PlotHole.title.like(like) | PlotHole.description.like(like))
+        match = fts_substring_query(q, ("title", "description"))
+        if match is not None:
+            stmt = stmt.where(PlotHole.id.in_(fts_rowids("plothole", match, mirror="trgm")))
+        else:
+            like = f"%{q}%"
+            stmt = stmt.where(PlotHole.title.like(like) | PlotHole.description.like(like))
     if tag:
-        ids = filter_entity_ids_by_tag(session, entity_type="plothole", tag_name=tag)
-        if not ids:
-            holes: list[PlotHole] = []
-            tags_by_id: dict[int, list[str]] = {}
-            return templates.TemplateResponse(
-                "partials/plothole_table.html",
-                {**_base_ctx(request), "holes": holes, "tags_by_id": tags_by_id, "linkify_mentions": linkify_mentions},
-            )
-        stmt = stmt.where(PlotHole.id.in_(ids))
+        stmt = stmt.where(has_tag(entity_type="plothole", entity_id=PlotHole.id, tag_name=tag))
 
     holes = session.exec(stmt.order_by(PlotHole.importance.desc(), PlotHole.created_at.desc())).all()
-    tags_by_id = {h.id: get_entity_tag_names(session, entity_type="plothole", entity_id=h.id) for h in holes if h.id}
+    tags_by_id = get_entity_tag_names_bulk(session, entity_type="plothole", entity_ids=[h.id for h in holes if h.id])
     return templates.TemplateResponse(
         "partials/plothole_table.html",
-        {**_base_ctx(request), "holes": holes, "tags_by_id": tags_by_id, "linkify_mentions": linkify_mentions},
+        {"request": request, "holes": holes, "tags_by_id": tags_by_id, "brainstorming": _brainstorming},
     )
 
 
@@ -115,23 +110,29 @@ def holes_list(
 def holes_row(
     hole_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     h = session.get(PlotHole, hole_id)
     if not h:
         return HTMLResponse("Not found", status_code=404)
+    # A pending brainstorm goes stale without a write, so the validator tracks it
+    etag = _row_etag(h.updated_at, "+brainstorming" if _brainstorming(h) else "")
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     tags = get_entity_tag_names(session, entity_type="plothole", entity_id=h.id) if h.id else []
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "partials/plothole_row.html",
-        {**_base_ctx(request), "h": h, "tags": tags, "linkify_mentions": linkify_mentions},
+        {"request": request, "h": h, "tags": tags, "brainstorming": _brainstorming},
     )
+    response.headers["ETag"] = etag
+    return response
 
 
 @router.get("/holes/{hole_id}/edit", response_class=HTMLResponse)
 def holes_edit_row(
     hole_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
     h = session.get(PlotHole, hole_id)
     if not h:
@@ -139,7 +140,7 @@ def holes_edit_row(
     tags = get_entity_tag_names(session, entity_type="plothole", entity_id=h.id) if h.id else []
     return templates.TemplateResponse(
         "partials/plothole_row_edit.html",
-        {**_base_ctx(request), "h": h, "tags_csv": ", ".join(tags), "problem_kinds": PROBLEM_KINDS, "linkify_mentions": linkify_mentions},
+        {"request": request, "h": h, "tags_csv": ", ".join(tags), "problem_kinds": PROBLEM_KINDS},
     )
 
 
@@ -165,9 +166,9 @@ def holes_update(
     h.importance = importance
     h.updated_at = utcnow()
     session.add(h)
-    session.commit()
     if h.id:
-        set_entity_tags(session, entity_type="plothole", entity_id=h.id, tag_names=parse_tag_names(tags))
+        set_entity_tags(session, entity_type="plothole", entity_id=h.id, tag_names=parse_tag_names(tags), commit=False)
+    session.commit()
     return holes_row(hole_id=hole_id, request=request, session=session)
 
 
@@ -203,9 +204,9 @@ def holes_create(
         related_entity_id=related_entity_id,
     )
     session.add(hole)
+    session.flush()
+    set_entity_tags(session, entity_type="plothole", entity_id=hole.id, tag_names=parse_tag_names(tags), commit=False)
     session.commit()
-    session.refresh(hole)
-    set_entity_tags(session, entity_type="plothole", entity_id=hole.id, tag_names=parse_tag_names(tags))
     return holes_list(request, session=session)
 
 
@@ -218,15 +219,41 @@ def holes_delete(
     hole = session.get(PlotHole, hole_id)
     if not hole:
         return HTMLResponse("Not found", status_code=404)
+    clear_entity_tags(session, entity_type="plothole", entity_id=hole_id)
     session.delete(hole)
     session.commit()
-    return holes_list(request, session=session)
+    return HTMLResponse("")
+
+
+def _save_brainstorm(hole_id: int, suggestions: str) -> None:
+    # Own session: the request's session is closed before background tasks run
+    with session_scope() as session:
+        hole = session.get(PlotHole, hole_id)
+        if not hole:
+            return
+        hole.ai_suggestions = suggestions
+        hole.brainstorm_pending = False
+        hole.updated_at = utcnow()
+        session.add(hole)
+        session.commit()
+
+
+async def _brainstorm_in_background(hole_id: int, plot_hole: dict, context: dict) -> None:
+    try:
+        result = await abrainstorm_plot_hole_solutions(plot_hole=plot_hole, context=context)
+        # Indented for the pre-wrap display; non-ASCII kept as-is rather than \uXXXX escapes
+        suggestions = json.dumps(result, indent=2, ensure_ascii=False)
+    except Exception as ex:
+        suggestions = f"AI brainstorm failed: {type(ex).__name__}"
+
+    await run_in_threadpool(_save_brainstorm, hole_id, suggestions)
 
 
 @router.post("/holes/{hole_id}/brainstorm", response_class=HTMLResponse)
 def holes_brainstorm(
     hole_id: int,
     request: Request,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
 ):
     hole = session.get(PlotHole, hole_id)
@@ -241,26 +268,20 @@ def holes_brainstorm(
         a = session.get(Act, hole.related_entity_id)
         related_name = a.title if a else None
 
-    # RAG-lite context: small, relevant snapshots
-    characters = session.exec(select(Character).order_by(Character.importance.desc(), Character.name).limit(25)).all()
-    acts = session.exec(select(Act).order_by(Act.importance.desc(), Act.title).limit(25)).all()
-    concepts = session.exec(select(Concept).order_by(Concept.importance.desc(), Concept.title).limit(25)).all()
-    events = session.exec(select(Event).order_by(Event.ai_suggested_order, Event.approx_order).limit(40)).all()
+    # RAG-lite context: small, relevant snapshots, read in one UNION ALL statement
+    rows = fetch_rag_rows(session, None, {"characters": 25, "acts": 25, "concepts": 25, "events": 40, "plot_holes": 0})
 
     context = {
         "characters": [
-            {"name": c.name, "traits": c.traits, "arc": c.arc, "status": c.status, "importance": c.importance, "incomplete": c.is_incomplete}
-            for c in characters
+            {"name": c.title, "traits": c.body, "arc": c.notes, "status": c.status, "importance": c.importance, "incomplete": bool(c.incomplete)}
+            for c in rows["characters"]
         ],
         "acts": [
-            {"title": a.title, "summary": a.summary, "status": a.status, "importance": a.importance, "incomplete": a.is_incomplete}
-            for a in acts
-        ],
-        "concepts": [{"title": c.title, "description": c.description, "status": c.status, "importance": c.importance} for c in concepts],
-        "events": [
-            {"title": e.title, "description": e.description, "order": (e.ai_suggested_order or e.approx_order)}
-            for e in events
+            {"title": a.title, "summary": a.body, "status": a.status, "importance": a.importance, "incomplete": bool(a.incomplete)}
+            for a in rows["acts"]
         ],
+        "concepts": [{"title": c.title, "description": c.body, "status": c.status, "importance": c.importance} for c in rows["concepts"]],
+        "events": [{"title": e.title, "description": e.body, "order": e.sort_order} for e in rows["events"]],
     }
 
     plot_hole_payload = {
@@ -270,19 +291,14 @@ def holes_brainstorm(
         "related_entity_name": related_name,
     }
 
-    try:
-        result = brainstorm_plot_hole_solutions(plot_hole=plot_hole_payload, context=context)
-        hole.ai_suggestions = json.dumps(result, indent=2)
-        hole.updated_at = utcnow()
-        session.add(hole)
-        session.commit()
-    except Exception as ex:
-        hole.ai_suggestions = f"AI brainstorm failed: {type(ex).__name__}"
-        hole.updated_at = utcnow()
-        session.add(hole)
-        session.commit()
+    # The LLM call runs after the response; the pending row polls itself until it
+    # lands, still showing the previous suggestions
+    hole.brainstorm_pending = True
+    hole.updated_at = utcnow()
+    session.add(hole)
+    session.commit()
+    background_tasks.add_task(_brainstorm_in_background, hole_id, plot_hole_payload, context)
 
-    # Re-render the list so the user sees the updated AI suggestions
-    return holes_list(request, session=session)
+    return holes_row(hole_id=hole_id, request=request, session=session)
 
 
@@ -1,78 +1,175 @@
 from __future__ import annotations
 
-from pathlib import Path
+from collections.abc import Iterator, Mapping
+from types import MappingProxyType
 
 from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
-
-from app.ai.timeline_engine import synthesize_and_align_timeline
-from app.core.config import get_settings
-from app.core.db import get_session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session, func, select
+
+from app.ai.timeline_engine import asynthesize_and_align_timeline
+from app.core.db import get_readonly_session, get_session
+from app.crud.search import fts_rowids, fts_substring_query
 from app.crud.tags import (
-    filter_entity_ids_by_tag,
-    get_entity_tag_names,
+    clear_entity_tags,
+    get_entity_tag_names_bulk,
+    get_with_tag_names,
+    has_tag,
     parse_tag_names,
     set_entity_tags,
 )
 from app.models.common import utcnow
 from app.models.timeline import Event
-from app.web.mentions import linkify_mentions
+from app.web.routes._common import _parse_int
+from app.web.templating import templates
 
 
 router = APIRouter(prefix="/timeline", tags=["timeline"])
-templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[1] / "templates"))
-settings = get_settings()
-
-ACT_BEATS: dict[str, list[str]] = {
-    "ACT 1": [
-        "Epilogue",
-        "Exposition/Introduction",
-        "Inciting Incident",
-        "Second Thoughts",
-        "Climax Of Act One",
-    ],
-    "ACT 2": [
-        "Obstacle (1)",
-        "Rising Action",
-        "Midpoint",
-        "Obstacle (2)",
-        "Disaster",
-        "Climax Of Act Two",
-    ],
-    "ACT 3": [
-        "Relative Peace",
-        "Obstacle",
-        "Rising Action",
-        "Disaster",
-        "Climax Of Act III",
-        "Resolution",
-        "Falling Action",
-    ],
+
+# Compiled once at import; _render skips TemplateResponse's per-call loader lookup
+_TPL = {
+    name: templates.get_template(name)
+    for name in ("timeline_events.html", "partials/event_table.html", "partials/event_row.html", "partials/event_row_edit.html")
 }
 
-def _parse_int(value: str | None) -> int | None:
-    if value is None:
-        return None
-    value = value.strip()
-    if value == "":
-        return None
-    try:
-        return int(value)
-    except ValueError:
-        return None
+
+def _render(name: str, context: dict) -> HTMLResponse:
+    return HTMLResponse(_TPL[name].render(context))
+
+
+# Bytes gathered per streamed write; one write for a typical table
+_STREAM_CHUNK = 64 * 1024
+
+
+def _stream(name: str, context: dict) -> StreamingResponse:
+    """
+    Like _render, but sends the page while Jinja is still producing it instead
+    of holding the whole string first. The context must not need the session:
+    the request-scoped one is closed before the body is generated.
+    """
+
+    def body() -> Iterator[str]:
+        buf: list[str] = []
+        size = 0
+        for piece in _TPL[name].generate(context):
+            buf.append(piece)
+            size += len(piece)
+            if size >= _STREAM_CHUNK:
+                yield "".join(buf)
+                buf, size = [], 0
+        if buf:
+            yield "".join(buf)
+
+    return StreamingResponse(body(), media_type="text/html")
+
+
+ACT_BEATS: Mapping[str, tuple[str, ...]] = MappingProxyType(
+    {
+        "ACT 1": (
+            "Epilogue",
+            "Exposition/Introduction",
+            "Inciting Incident",
+            "Second Thoughts",
+            "Climax Of Act One",
+        ),
+        "ACT 2": (
+            "Obstacle (1)",
+            "Rising Action",
+            "Midpoint",
+            "Obstacle (2)",
+            "Disaster",
+            "Climax Of Act Two",
+        ),
+        "ACT 3": (
+            "Relative Peace",
+            "Obstacle",
+            "Rising Action",
+            "Disaster",
+            "Climax Of Act III",
+            "Resolution",
+            "Falling Action",
+        ),
+    }
+)
+# Read-only and identical for every request, so a template global rather than a context key
+templates.env.globals["act_beats"] = ACT_BEATS
+
+
+# Sort: AI suggested order first if present, else approx_order, else id.
+# ORDER BY form matches the ix_event_timeline_order expression index, so SQLite
+# returns rows already sorted; _timeline_key is the same order for in-memory lists.
+_TIMELINE_ORDER = (Event.ai_suggested_order.is_(None), Event.ai_suggested_order, Event.approx_order, Event.id)
+
+
+# What event_row.html reads. events_list renders these rows read-only, so it selects
+# plain Row tuples instead of tracked Event objects; effective_order is labelled so
+# rows answer e.effective_order like the hybrid does on an Event.
+_CARD_COLUMNS = (
+    Event.id,
+    Event.title,
+    Event.description,
+    Event.act,
+    Event.beat,
+    Event.approx_order,
+    Event.ai_suggested_order,
+    Event.ai_notes,
+    Event.status,
+    Event.importance,
+    Event.is_incomplete,
+    Event.effective_order.label("effective_order"),
+)
+
+
+def _timeline_key(e: Event) -> tuple:
+    return (e.ai_suggested_order is None, e.ai_suggested_order or 0, e.approx_order, e.id or 0)
+
+
+def _render_event_table(
+    request: Request,
+    events: list,
+    tags_by_id: dict[int, tuple[str, ...]],
+    *,
+    timeline: list[dict] | None = None,
+    global_notes: str | None = None,
+    t: int | None = None,
+    t_min: int = 0,
+    t_max: int = 0,
+    t_value: int = 0,
+) -> StreamingResponse:
+    """
+    Every event_table.html render goes through here, so no path can miss a
+    context key. Streamed, as the table grows with the story; events are plain
+    rows or already-loaded Events, so rendering needs no session.
+    """
+    return _stream(
+        "partials/event_table.html",
+        {
+            "request": request,
+            "events": events,
+            "tags_by_id": tags_by_id,
+            "global_notes": global_notes,
+            "timeline": timeline or [],
+            "t": t,
+            "t_min": t_min,
+            "t_max": t_max,
+            "t_value": t_value,
+        },
+    )
 
 
-def _base_ctx(request: Request) -> dict:
-    return {"request": request, "db_path": str(settings.sqlite_path)}
+def _targets_row(request: Request, event_id: int) -> bool:
+    """True when HTMX will swap just this event's card, so the full list need not be rebuilt."""
+    return request.headers.get("hx-target") == f"event-row-{event_id}"
 
 
 @router.get("/events", response_class=HTMLResponse)
 def events_page(request: Request):
-    return templates.TemplateResponse(
+    return _render(
         "timeline_events.html",
-        {**_base_ctx(request), "title": "Timeline", "act_beats": ACT_BEATS},
+        {"request": request, "title": "Timeline"},
     )
 
 
@@ -86,95 +183,67 @@ def events_list(
     tag: str | None = None,
     q: str | None = None,
     t: str | None = None,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
-    stmt = select(Event)
+    filters: list = []
     if act:
-        stmt = stmt.where(Event.act == act)
+        filters.append(Event.act == act)
     if beat:
-        stmt = stmt.where(Event.beat == beat)
+        filters.append(Event.beat == beat)
     if status:
-        stmt = stmt.where(Event.status == status)
+        filters.append(Event.status == status)
     importance_i = _parse_int(importance)
     if importance_i is not None:
-        stmt = stmt.where(Event.importance == importance_i)
-    if q:
-        like = f"%{q}%"
-        stmt = stmt.where(Event.title.like(like) | Event.description.like(like))
+        filters.append(Event.importance == importance_i)
+    # Blank input (a stray space while typing) is no filter, not a LIKE '% %' scan of every description
+    if q and not q.isspace():
+        match = fts_substring_query(q, ("title", "description"))
+        if match is not None:
+            filters.append(Event.id.in_(fts_rowids("event", match, mirror="trgm")))
+        else:
+            # Under 3 characters trigrams cannot match; only a substring scan can
+            like = f"%{q}%"
+            filters.append(Event.title.like(like) | Event.description.like(like))
     if tag:
-        ids = filter_entity_ids_by_tag(session, entity_type="event", tag_name=tag)
-        if not ids:
-            events: list[Event] = []
-            tags_by_id: dict[int, list[str]] = {}
-            return templates.TemplateResponse(
-                "partials/event_table.html",
-                {
-                    **_base_ctx(request),
-                    "events": events,
-                    "tags_by_id": tags_by_id,
-                    "global_notes": None,
-                    "timeline": [],
-                    "t": t,
-                    "t_min": 0,
-                    "t_max": 0,
-                    "t_value": 0,
-                    "linkify_mentions": linkify_mentions,
-                },
-            )
-        stmt = stmt.where(Event.id.in_(ids))
-
-    events = session.exec(stmt).all()
-    # Sort: AI suggested order first if present, else approx_order, else id
-    events.sort(key=lambda e: (e.ai_suggested_order is None, e.ai_suggested_order or 10**9, e.approx_order, e.id or 0))
-
-    # Scrub range is based on effective order for currently filtered events (before applying t)
-    effective_all = [(e.ai_suggested_order or e.approx_order) for e in events]
-    if effective_all:
-        t_min = min(effective_all)
-        t_max = max(effective_all)
-    else:
-        t_min = 0
-        t_max = 0
+        filters.append(has_tag(entity_type="event", entity_id=Event.id, tag_name=tag))
+
     t_i = _parse_int(t)
+    if t_i is None:
+        events = session.exec(select(*_CARD_COLUMNS).where(*filters).order_by(*_TIMELINE_ORDER)).all()
+        effective = [e.effective_order for e in events]
+        # Scrub range is based on effective order for currently filtered events
+        t_min = min(effective, default=0)
+        t_max = max(effective, default=0)
+    else:
+        # Scrub range still spans every filtered event (before applying t): aggregate it in SQL,
+        # then load only the events up to "t". MIN and MAX go in separate scalar subqueries so
+        # each can be answered from an end of ix_event_effective_order.
+        def bound(agg):
+            return select(func.coalesce(agg(Event.effective_order), 0)).where(*filters).scalar_subquery()
+
+        t_min, t_max = session.exec(select(bound(func.min), bound(func.max))).one()
+        events = session.exec(
+            select(*_CARD_COLUMNS).where(*filters, Event.effective_order <= t_i).order_by(*_TIMELINE_ORDER)
+        ).all()
+        effective = [e.effective_order for e in events]
     t_value = t_max if t_i is None else t_i
 
-    # Scrub filter: show events up to "t" by effective order (AI if present, else approx)
-    if t_i is not None:
-        events = [e for e in events if ((e.ai_suggested_order or e.approx_order) <= t_i)]
+    if events:
+        tags_by_id = get_entity_tag_names_bulk(session, entity_type="event", entity_ids=[e.id for e in events if e.id])
 
-    tags_by_id = {e.id: get_entity_tag_names(session, entity_type="event", entity_id=e.id) for e in events if e.id}
-
-    # timeline points positioned on a 0..100% line
-    effective_orders = [(e.ai_suggested_order or e.approx_order) for e in events]
-    if effective_orders:
-        lo = min(effective_orders)
-        hi = max(effective_orders)
+        # timeline points positioned on a 0..100% line
+        lo, hi = (t_min, t_max) if t_i is None else (min(effective), max(effective))
         span = max(1, hi - lo)
         timeline = [
-            {
-                "event": e,
-                "order": (e.ai_suggested_order or e.approx_order),
-                "pct": int(round((( (e.ai_suggested_order or e.approx_order) - lo) / span) * 100)),
-            }
-            for e in events
+            {"event": e, "order": o, "pct": int(round(((o - lo) / span) * 100))}
+            for e, o in zip(events, effective)
         ]
     else:
-        timeline = []
+        # No matches, or all past the scrub point: skip the tag lookup and timeline build
+        tags_by_id, timeline = {}, []
 
-    return templates.TemplateResponse(
-        "partials/event_table.html",
-        {
-            **_base_ctx(request),
-            "events": events,
-            "tags_by_id": tags_by_id,
-            "global_notes": None,
-            "timeline": timeline,
-            "t": t_i,
-            "t_min": t_min,
-            "t_max": t_max,
-            "t_value": t_value,
-            "linkify_mentions": linkify_mentions,
-        },
+    return _render_event_table(
+        request, events, tags_by_id, timeline=timeline, t=t_i, t_min=t_min, t_max=t_max, t_value=t_value
     )
 
 
@@ -191,6 +260,8 @@ def events_create(
     tags: str = Form(""),
     session: Session = Depends(get_session),
 ):
+    # One timestamp for the row's created_at/updated_at and its taggings
+    now = utcnow()
     e = Event(
         title=title,
         description=description,
@@ -199,11 +270,13 @@ def events_create(
         approx_order=approx_order,
         status=status,
         importance=importance,
+        created_at=now,
+        updated_at=now,
     )
     session.add(e)
+    session.flush()
+    set_entity_tags(session, entity_type="event", entity_id=e.id, tag_names=parse_tag_names(tags), commit=False, now=now)
     session.commit()
-    session.refresh(e)
-    set_entity_tags(session, entity_type="event", entity_id=e.id, tag_names=parse_tag_names(tags))
     return events_list(request, session=session)
 
 
@@ -211,15 +284,14 @@ def events_create(
 def events_row(
     event_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
-    e = session.get(Event, event_id)
+    e, tags = get_with_tag_names(session, Event, entity_type="event", entity_id=event_id)
     if not e:
         return HTMLResponse("Not found", status_code=404)
-    tags = get_entity_tag_names(session, entity_type="event", entity_id=e.id) if e.id else []
-    return templates.TemplateResponse(
+    return _render(
         "partials/event_row.html",
-        {**_base_ctx(request), "e": e, "tags": tags, "linkify_mentions": linkify_mentions},
+        {"request": request, "e": e, "tags": tags},
     )
 
 
@@ -227,15 +299,14 @@ def events_row(
 def events_edit_row(
     event_id: int,
     request: Request,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_readonly_session),
 ):
-    e = session.get(Event, event_id)
+    e, tags = get_with_tag_names(session, Event, entity_type="event", entity_id=event_id)
     if not e:
         return HTMLResponse("Not found", status_code=404)
-    tags = get_entity_tag_names(session, entity_type="event", entity_id=e.id) if e.id else []
-    return templates.TemplateResponse(
+    return _render(
         "partials/event_row_edit.html",
-        {**_base_ctx(request), "e": e, "tags_csv": ", ".join(tags), "act_beats": ACT_BEATS, "linkify_mentions": linkify_mentions},
+        {"request": request, "e": e, "tags_csv": ", ".join(tags)},
     )
 
 
@@ -263,11 +334,13 @@ def events_update(
     e.approx_order = approx_order
     e.status = status
     e.importance = importance
-    e.updated_at = utcnow()
+    e.updated_at = now = utcnow()
     session.add(e)
-    session.commit()
     if e.id:
-        set_entity_tags(session, entity_type="event", entity_id=e.id, tag_names=parse_tag_names(tags))
+        set_entity_tags(
+            session, entity_type="event", entity_id=e.id, tag_names=parse_tag_names(tags), commit=False, now=now
+        )
+    session.commit()
     return events_row(event_id=event_id, request=request, session=session)
 
 
@@ -284,6 +357,8 @@ def events_toggle_incomplete(
     e.updated_at = utcnow()
     session.add(e)
     session.commit()
+    if _targets_row(request, event_id):
+        return events_row(event_id=event_id, request=request, session=session)
     return events_list(request, session=session)
 
 
@@ -296,70 +371,40 @@ def events_delete(
     e = session.get(Event, event_id)
     if not e:
         return HTMLResponse("Not found", status_code=404)
+    clear_entity_tags(session, entity_type="event", entity_id=event_id)
     session.delete(e)
     session.commit()
+    if _targets_row(request, event_id):
+        # Empty body removes the card; the trigger makes #event-table refetch the scrub strip
+        return HTMLResponse("", headers={"HX-Trigger": "eventsChanged"})
     return events_list(request, session=session)
 
 
-@router.post("/synthesize", response_class=HTMLResponse)
-def synthesize(
-    request: Request,
-    session: Session = Depends(get_session),
-):
-    events = session.exec(select(Event)).all()
-    if not events:
-        return templates.TemplateResponse(
-            "partials/event_table.html",
-            {
-                **_base_ctx(request),
-                "events": [],
-                "tags_by_id": {},
-                "global_notes": "Add events first.",
-                "timeline": [],
-                "t": None,
-                "t_min": 0,
-                "t_max": 0,
-                "t_value": 0,
-                "linkify_mentions": linkify_mentions,
-            },
-        )
-
-    payload = [
-        {
-            "id": e.id,
-            "title": e.title,
-            "description": e.description,
-            "approx_order": e.approx_order,
-            "act": e.act,
-            "beat": e.beat,
-        }
-        for e in events
-        if e.id is not None
-    ]
-
-    try:
-        result = synthesize_and_align_timeline(events=payload)
-    except Exception as ex:  # keep UI simple; Phase 4 can refine error handling
-        return templates.TemplateResponse(
-            "partials/event_table.html",
+def _synthesis_input(session: Session) -> tuple[dict[int, Event], list[dict], dict[int, tuple[str, ...]]]:
+    """Events by id (in timeline order), the AI payload, and their tags."""
+    # One pass over the rows builds both the id map and the AI payload
+    by_id: dict[int, Event] = {}
+    payload: list[dict] = []
+    for e in session.exec(select(Event).order_by(*_TIMELINE_ORDER)):
+        by_id[e.id] = e
+        payload.append(
             {
-                **_base_ctx(request),
-                "events": events,
-                "tags_by_id": {e.id: get_entity_tag_names(session, entity_type="event", entity_id=e.id) for e in events if e.id},
-                "global_notes": f"AI synthesis failed: {type(ex).__name__}",
-                "timeline": [],
-                "t": None,
-                "t_min": 0,
-                "t_max": 0,
-                "t_value": 0,
-                "linkify_mentions": linkify_mentions,
-            },
+                "id": e.id,
+                "title": e.title,
+                "description": e.description,
+                "approx_order": e.approx_order,
+                "act": e.act,
+                "beat": e.beat,
+            }
         )
+    # Synthesis never changes tags, so one fetch serves either outcome
+    tags_by_id = get_entity_tag_names_bulk(session, entity_type="event", entity_ids=list(by_id)) if by_id else {}
+    return by_id, payload, tags_by_id
 
-    aligned = result.get("aligned", [])
-    global_notes = result.get("global_notes")
 
-    by_id = {e.id: e for e in events if e.id is not None}
+def _save_alignment(session: Session, by_id: dict[int, Event], aligned: list) -> None:
+    now = utcnow()
+    updates: list[dict] = []
     for row in aligned:
         try:
             eid = int(row["id"])
@@ -367,30 +412,40 @@ def synthesize(
             notes = str(row.get("notes", ""))
         except Exception:
             continue
-        ev = by_id.get(eid)
-        if not ev:
-            continue
-        ev.ai_suggested_order = suggested
-        ev.ai_notes = notes
-        ev.updated_at = utcnow()
-        session.add(ev)
+        if eid in by_id:
+            updates.append({"id": eid, "ai_suggested_order": suggested, "ai_notes": notes, "updated_at": now})
+    if updates:
+        # ORM bulk UPDATE by primary key: one executemany instead of a flush issuing an UPDATE per
+        # dirty Event. It bypasses the loaded objects, so mirror the values onto them as already
+        # persisted (no second UPDATE at commit) for the re-render.
+        session.exec(update(Event), params=updates)
+        for values in updates:
+            ev = by_id[values["id"]]
+            for key in ("ai_suggested_order", "ai_notes", "updated_at"):
+                set_committed_value(ev, key, values[key])
     session.commit()
 
-    # Re-render list (sorted with ai_suggested_order)
-    return templates.TemplateResponse(
-        "partials/event_table.html",
-        {
-            **_base_ctx(request),
-            "events": sorted(by_id.values(), key=lambda e: (e.ai_suggested_order is None, e.ai_suggested_order or 10**9, e.approx_order, e.id or 0)),
-            "tags_by_id": {e.id: get_entity_tag_names(session, entity_type="event", entity_id=e.id) for e in by_id.values() if e.id},
-            "global_notes": global_notes,
-            "timeline": [],
-            "t": None,
-            "t_min": 0,
-            "t_max": 0,
-            "t_value": 0,
-            "linkify_mentions": linkify_mentions,
-        },
-    )
 
+@router.post("/synthesize", response_class=HTMLResponse)
+async def synthesize(
+    request: Request,
+    session: Session = Depends(get_session),
+):
+    # The session is sync, so its reads and writes run on the threadpool, not the event loop
+    by_id, payload, tags_by_id = await run_in_threadpool(_synthesis_input, session)
+    if not by_id:
+        return _render_event_table(request, [], {}, global_notes="Add events first.")
+
+    try:
+        result = await asynthesize_and_align_timeline(events=payload)
+    except Exception as ex:  # keep UI simple; Phase 4 can refine error handling
+        return _render_event_table(
+            request, list(by_id.values()), tags_by_id, global_notes=f"AI synthesis failed: {type(ex).__name__}"
+        )
 
+    await run_in_threadpool(_save_alignment, session, by_id, result.get("aligned", []))
+
+    # Re-render list (sorted with the new ai_suggested_order; in memory, not a re-query)
+    return _render_event_table(
+        request, sorted(by_id.values(), key=_timeline_key), tags_by_id, global_notes=result.get("global_notes")
+    )
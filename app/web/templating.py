@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
+
+from app.core.config import get_settings
+from app.web.mentions import linkify_mentions
+
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+# One environment for every router, so each template is compiled once per
+# process; compiled bytecode is also kept on disk (per-user temp dir) across
+# restarts. Template files are only re-checked for edits in debug mode.
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=True,
+    auto_reload=get_settings().debug,
+    bytecode_cache=FileSystemBytecodeCache(),
+)
+
+
+@lru_cache(maxsize=4096)
+def _tag_chips_html(tags: tuple[str, ...]) -> Markup:
+    return Markup(env.get_template("partials/tag_chips.html").render(tags=tags))
+
+
+def tag_chips(tags: Iterable[str]) -> Markup:
+    """
+    Rendered tag chips for an entity card. The HTML depends only on the names,
+    so it is cached by them: a tag edit changes the key, and nothing needs
+    invalidating.
+    """
+    return _tag_chips_html(tuple(tags))
+
+
+# Constant across requests, so set once instead of in every context dict
+env.globals.update(linkify_mentions=linkify_mentions, tag_chips=tag_chips, db_path=str(get_settings().sqlite_path))
+templates = Jinja2Templates(env=env)